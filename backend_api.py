@@ -25,9 +25,10 @@ try:
     from modules.scoring_engine import HealthScoringEngine
     from modules.explanation_engine import ExplanationEngine
     from modules.database import DatabaseManager
-    from modules.medical_llm_service import medical_llm_service
+    from modules.medical_llm_service import get_medical_llm_service
     from modules.simple_medical_llm import simple_medical_llm_service
     from modules.gemini_service import gemini_medical_service
+    medical_llm_service = get_medical_llm_service()
     MODULES_AVAILABLE = True
 except ImportError as e:
     print(f"Warning: Could not import modules: {e}")
@@ -7,7 +7,24 @@ import os
 from PIL import Image
 import base64
 import io
-from .medical_llm_service import medical_llm_service
+import threading
+from .medical_llm_service import get_medical_llm_service
+
+# Try to import Hyperscan for single-pass multi-pattern OCR text scanning,
+# fallback to the standard re module if not available
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
+# Try to import pyahocorasick for the cheap ingredient prefilter,
+# fallback to always calling the LLM if not available
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
 
 class LLMTextExtractor:
     """
@@ -15,11 +32,69 @@ class LLMTextExtractor:
     Uses OpenAI GPT-4 and Anthropic Claude for medical-grade accuracy
     """
     
+    # Regex patterns for OCR nutrition extraction
+    _nutrition_patterns = {
+        'calories': r'calories?\s*:?\s*(\d+(?:\.\d+)?)',
+        'total_fat': r'total\s*fat\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'saturated_fat': r'saturated\s*fat\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'trans_fat': r'trans\s*fat\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'cholesterol': r'cholesterol\s*:?\s*(\d+(?:\.\d+)?)\s*mg',
+        'sodium': r'sodium\s*:?\s*(\d+(?:\.\d+)?)\s*mg',
+        'total_carbohydrate': r'total\s*carbohydrate\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'dietary_fiber': r'dietary\s*fiber\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'total_sugars': r'total\s*sugars?\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'added_sugars': r'added\s*sugars?\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'protein': r'protein\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'vitamin_d': r'vitamin\s*d\s*:?\s*(\d+(?:\.\d+)?)\s*mcg',
+        'calcium': r'calcium\s*:?\s*(\d+(?:\.\d+)?)\s*mg',
+        'iron': r'iron\s*:?\s*(\d+(?:\.\d+)?)\s*mg',
+        'potassium': r'potassium\s*:?\s*(\d+(?:\.\d+)?)\s*mg'
+    }
+
+    # Lazily compiled Hyperscan database shared across instances
+    _hyperscan_db = None
+    _hyperscan_nutrients = None
+
+    # Terms that mean an ingredient list needs full LLM analysis
+    # (allergens, additives, preservatives, artificial ingredients)
+    _flagged_ingredient_terms = [
+        # Allergens
+        'milk', 'egg', 'fish', 'shellfish', 'shrimp', 'crab', 'lobster',
+        'tree nut', 'almond', 'hazelnut', 'walnut', 'cashew', 'pecan',
+        'pistachio', 'macadamia', 'peanut', 'wheat', 'gluten', 'soy',
+        'soybean', 'sesame', 'mustard', 'celery', 'lupin', 'sulphite',
+        'sulfite',
+        # Additives and preservatives
+        'preservative', 'artificial', 'synthetic', 'stabilizer', 'emulsifier',
+        'thickener', 'flavor enhancer', 'msg', 'monosodium glutamate',
+        'bht', 'bha', 'sodium benzoate', 'potassium sorbate',
+        'calcium propionate', 'sodium nitrite', 'sodium nitrate',
+        'sodium sulfite', 'sodium bisulfite', 'sodium metabisulfite',
+        # Artificial colors
+        'red 40', 'yellow 5', 'yellow 6', 'blue 1', 'blue 2', 'green 3',
+        'red 3', 'tartrazine', 'sunset yellow', 'allura red',
+        'brilliant blue', 'indigo carmine', 'fd&c',
+        # Artificial sweeteners
+        'aspartame', 'sucralose', 'saccharin', 'acesulfame', 'neotame',
+        'advantame'
+    ]
+
+    # Lazily built Aho-Corasick automaton shared across instances
+    _flagged_automaton = None
+
+    # Precompiled patterns for ingredient canonicalization
+    _whitespace_pattern = re.compile(r'\s+')
+    _parenthetical_pattern = re.compile(r'\([^)]*\)')
+    _ingredient_noise_pattern = re.compile(r'contains\s+2%\s+or\s+less\s+of\s*:?', re.IGNORECASE)
+
     def __init__(self):
         self.openai_client = None
         self.anthropic_client = None
-        self.medical_llm = medical_llm_service
-        
+        self.medical_llm = get_medical_llm_service()
+        # Reusable per-thread image encode buffer (avoids reallocating
+        # multi-MB BytesIO objects on every call)
+        self._tls = threading.local()
+
         # Initialize API clients if keys are available
         if os.getenv('OPENAI_API_KEY'):
             self.openai_client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
@@ -33,10 +108,16 @@ class LLMTextExtractor:
     def extract_nutrition_from_image(self, image: Image.Image) -> Dict[str, Any]:
         """Extract nutrition information from food label image using LLM"""
         try:
-            # Convert image to base64
-            img_buffer = io.BytesIO()
+            # Convert image to base64, reusing one buffer per thread
+            img_buffer = getattr(self._tls, 'buf', None)
+            if img_buffer is None:
+                img_buffer = self._tls.buf = io.BytesIO()
+            img_buffer.seek(0)
+            img_buffer.truncate(0)
             image.save(img_buffer, format='PNG')
-            img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
+            # getbuffer() is a memoryview over the internal array, so this
+            # avoids the extra bytes copy that getvalue() would make
+            img_base64 = base64.b64encode(img_buffer.getbuffer()).decode()
             
             # Try OpenAI GPT-4 Vision first
             if self.openai_client:
@@ -239,37 +320,81 @@ class LLMTextExtractor:
         except Exception as e:
             return {'error': f'OCR fallback failed: {str(e)}'}
     
+    @classmethod
+    def _get_hyperscan_db(cls):
+        """Compile all nutrition patterns into a single Hyperscan database (once)"""
+        if cls._hyperscan_db is None:
+            nutrients = list(cls._nutrition_patterns)
+            db = hyperscan.Database()
+            db.compile(
+                expressions=[cls._nutrition_patterns[n].encode() for n in nutrients],
+                ids=list(range(len(nutrients))),
+                flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST] * len(nutrients)
+            )
+            cls._hyperscan_db = db
+            cls._hyperscan_nutrients = nutrients
+        return cls._hyperscan_db
+
+    def _extract_nutrition_hyperscan(self, text_lower: str) -> Dict[str, float]:
+        """Extract nutrition facts with a single Hyperscan pass over the text"""
+        db = self._get_hyperscan_db()
+        spans = {}
+
+        def on_match(pattern_id, start, end, flags, context):
+            # Keep the first (leftmost) match per pattern, like re.search.
+            # Hyperscan fires an event at every end offset, so for the same
+            # start keep the longest end rather than the first event.
+            if pattern_id not in spans:
+                spans[pattern_id] = (start, end)
+            else:
+                kept_start, kept_end = spans[pattern_id]
+                if start < kept_start or (start == kept_start and end > kept_end):
+                    spans[pattern_id] = (start, end)
+
+        # Keep the encoded text: Hyperscan offsets index the UTF-8 bytes,
+        # not the str, so slicing must happen in the byte domain
+        text_bytes = text_lower.encode()
+        db.scan(text_bytes, match_event_handler=on_match)
+
+        nutrition = {}
+        for pattern_id, (start, _end) in spans.items():
+            nutrient = self._hyperscan_nutrients[pattern_id]
+            # Hyperscan reports spans only, so re-run the pattern from the
+            # match start to capture the numeric group; scanning the tail
+            # rather than the reported slice keeps the full number even if
+            # the event's end offset stopped mid-digits. The slice is taken
+            # from the bytes (a match starts on an ASCII pattern character,
+            # so it falls on a valid UTF-8 boundary) and decoded back.
+            tail = text_bytes[start:].decode('utf-8', 'replace')
+            match = re.search(self._nutrition_patterns[nutrient], tail)
+            if match:
+                try:
+                    nutrition[nutrient] = float(match.group(1))
+                except ValueError:
+                    continue
+
+        return nutrition
+
     def _extract_nutrition_regex(self, text: str) -> Dict[str, float]:
         """Extract nutrition facts using regex patterns"""
-        nutrition = {}
         text_lower = text.lower()
-        
-        patterns = {
-            'calories': r'calories?\s*:?\s*(\d+(?:\.\d+)?)',
-            'total_fat': r'total\s*fat\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'saturated_fat': r'saturated\s*fat\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'trans_fat': r'trans\s*fat\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'cholesterol': r'cholesterol\s*:?\s*(\d+(?:\.\d+)?)\s*mg',
-            'sodium': r'sodium\s*:?\s*(\d+(?:\.\d+)?)\s*mg',
-            'total_carbohydrate': r'total\s*carbohydrate\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'dietary_fiber': r'dietary\s*fiber\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'total_sugars': r'total\s*sugars?\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'added_sugars': r'added\s*sugars?\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'protein': r'protein\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'vitamin_d': r'vitamin\s*d\s*:?\s*(\d+(?:\.\d+)?)\s*mcg',
-            'calcium': r'calcium\s*:?\s*(\d+(?:\.\d+)?)\s*mg',
-            'iron': r'iron\s*:?\s*(\d+(?:\.\d+)?)\s*mg',
-            'potassium': r'potassium\s*:?\s*(\d+(?:\.\d+)?)\s*mg'
-        }
-        
-        for nutrient, pattern in patterns.items():
+
+        # Use the single-pass Hyperscan scanner when available
+        if HYPERSCAN_AVAILABLE:
+            try:
+                return self._extract_nutrition_hyperscan(text_lower)
+            except Exception:
+                pass  # Fall back to per-pattern re scanning
+
+        nutrition = {}
+        for nutrient, pattern in self._nutrition_patterns.items():
             match = re.search(pattern, text_lower)
             if match:
                 try:
                     nutrition[nutrient] = float(match.group(1))
                 except ValueError:
                     continue
-        
+
         return nutrition
     
     def _extract_ingredients_regex(self, text: str) -> List[str]:
@@ -318,12 +443,80 @@ class LLMTextExtractor:
         
         return 'Unknown'
     
-    def analyze_ingredients_with_llm(self, ingredients: List[str]) -> Dict[str, Any]:
+    def _canonicalize_ingredients(self, ingredients: List[str], compact: bool = False) -> List[str]:
+        """Canonicalize ingredients before sending to LLM (lowercase, dedupe, strip noise)
+
+        Duplicates and whitespace variants waste prompt tokens, so each entry is
+        lowercased, whitespace-collapsed, and deduped while preserving order.
+        With compact=True, parenthetical sub-ingredients are also dropped.
+        """
+        canonical = []
+        for ingredient in ingredients:
+            if not ingredient:
+                continue
+            cleaned = self._ingredient_noise_pattern.sub('', ingredient)
+            if compact:
+                cleaned = self._parenthetical_pattern.sub('', cleaned)
+            cleaned = self._whitespace_pattern.sub(' ', cleaned).strip().lower()
+            if cleaned:
+                canonical.append(cleaned)
+
+        # Order-preserving dedup
+        return list(dict.fromkeys(canonical))
+
+    @classmethod
+    def _get_flagged_automaton(cls):
+        """Build the Aho-Corasick automaton over flagged terms (once)"""
+        if cls._flagged_automaton is None:
+            automaton = ahocorasick.Automaton()
+            for term in cls._flagged_ingredient_terms:
+                automaton.add_word(term, term)
+            automaton.make_automaton()
+            cls._flagged_automaton = automaton
+        return cls._flagged_automaton
+
+    def _prefilter_ingredients(self, ingredients: List[str]) -> Optional[Dict[str, Any]]:
+        """Synthesize a local analysis for trivially benign ingredient lists
+
+        Scans the ingredients once with Aho-Corasick; if no allergen,
+        additive, or artificial-ingredient term matches, the LLM call can be
+        skipped entirely. Returns None when full LLM analysis is needed.
+        """
+        if not AHOCORASICK_AVAILABLE or len(ingredients) > 10:
+            return None
+
+        haystack = ' '.join(ingredients).lower()
+        if any(True for _ in self._get_flagged_automaton().iter(haystack)):
+            return None
+
+        return {
+            'additives': [],
+            'preservatives': [],
+            'artificial_colors': [],
+            'artificial_flavors': [],
+            'artificial_sweeteners': [],
+            'natural_ingredients': list(ingredients),
+            'allergens': [],
+            'health_concerns': [],
+            'health_benefits': [],
+            'processing_level': 'minimal',
+            'overall_assessment': 'good',
+            'source': 'local prefilter'
+        }
+
+    def analyze_ingredients_with_llm(self, ingredients: List[str], compact: bool = False) -> Dict[str, Any]:
         """Analyze ingredients using LLM for health insights"""
         if not self.openai_client and not self.anthropic_client:
             return {'error': 'No LLM API keys available'}
-        
+
         try:
+            ingredients = self._canonicalize_ingredients(ingredients, compact=compact)
+
+            # Skip the LLM round-trip for short, trivially benign lists
+            local_analysis = self._prefilter_ingredients(ingredients)
+            if local_analysis is not None:
+                return local_analysis
+
             ingredients_text = ', '.join(ingredients)
             
             prompt = f"""
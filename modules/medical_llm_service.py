@@ -4,36 +4,334 @@ Uses BioMistral 7B - a medical-grade LLM trained on PubMed Central data
 """
 
 import os
+import copy
+import math
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import json
 import re
-from datetime import datetime
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from types import MappingProxyType
 
-# Try to import ML dependencies, fallback to demo mode if not available
+# ML dependencies are imported lazily in load_model so that merely
+# importing this module (e.g. for demo-mode scoring) does not pay the
+# torch import and CUDA probe cost
+torch = None
+AutoTokenizer = None
+AutoModelForCausalLM = None
+BitsAndBytesConfig = None
+ML_AVAILABLE = None
+
+def _import_ml_dependencies() -> bool:
+    """
+    Import torch/transformers on first use, fallback to demo mode
+    """
+    global torch, AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig, ML_AVAILABLE
+    if ML_AVAILABLE is not None:
+        return ML_AVAILABLE
+
+    try:
+        import torch as _torch
+        from transformers import (
+            AutoTokenizer as _AutoTokenizer,
+            AutoModelForCausalLM as _AutoModelForCausalLM,
+            BitsAndBytesConfig as _BitsAndBytesConfig
+        )
+        torch = _torch
+        AutoTokenizer = _AutoTokenizer
+        AutoModelForCausalLM = _AutoModelForCausalLM
+        BitsAndBytesConfig = _BitsAndBytesConfig
+        ML_AVAILABLE = True
+    except ImportError as e:
+        print(f"Warning: ML dependencies not available: {e}")
+        print("Running in demo mode...")
+        ML_AVAILABLE = False
+
+    return ML_AVAILABLE
+
+# Try to import pyahocorasick for single-pass ingredient scanning,
+# fallback to a precompiled regex alternation if not available
 try:
-    import torch
-    from transformers import (
-        AutoTokenizer, 
-        AutoModelForCausalLM, 
-        BitsAndBytesConfig,
-        pipeline
-    )
-    ML_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: ML dependencies not available: {e}")
-    print("Running in demo mode...")
-    ML_AVAILABLE = False
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Precompiled response-parsing patterns (hot path for every LLM response)
+_SCORE_RE = re.compile(r'HEALTH SCORE[:\s]*(\d+)', re.IGNORECASE)
+_CONCERNS_RE = re.compile(
+    r'MEDICAL CONCERNS[:\s]*(.*?)(?=NUTRIENT ANALYSIS|CLINICAL RECOMMENDATIONS|$)',
+    re.IGNORECASE | re.DOTALL
+)
+
+def _extract_json(text: str) -> Optional[str]:
+    """
+    Extract the first balanced JSON object from text with a single linear scan
+
+    Tracks brace depth and string/escape state instead of using a greedy
+    DOTALL regex, so there is no backtracking and the first complete object
+    wins even when the response contains several JSON-ish blocks.
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+
+    return None
+
+# Every keyword any of the demo scoring helpers looks for in ingredients
+_HARMFUL_TERMS = frozenset({
+    "artificial sweetener", "high fructose corn syrup", "trans fat",
+    "sodium benzoate", "artificial color", "preservative"
+})
+_INGREDIENT_TERMS = tuple(_HARMFUL_TERMS | {"sodium", "sugar", "artificial"})
+
+# Regex fallback: longest-first alternation, plus a containment map so a
+# long match (e.g. "artificial sweetener") still reports the shorter terms
+# it covers (e.g. "artificial"), matching substring-scan semantics
+_TERM_RE = re.compile(
+    "|".join(re.escape(t) for t in sorted(_INGREDIENT_TERMS, key=len, reverse=True))
+)
+_TERM_IMPLIES = {
+    term: frozenset(other for other in _INGREDIENT_TERMS if other != term and other in term)
+    for term in _INGREDIENT_TERMS
+}
+
+# Medical nutrition guidelines and references. Built once at module scope;
+# the backing dict is what gets embedded in (JSON-serialized) analysis
+# results, while the MappingProxyType view is handed to programmatic
+# consumers so they cannot mutate the shared table.
+_MEDICAL_GUIDELINES = {
+    "who_guidelines": {
+        "sodium": {"max_daily": 2000, "unit": "mg"},
+        "sugar": {"max_daily": 50, "unit": "g"},
+        "saturated_fat": {"max_daily": 22, "unit": "g"},
+        "trans_fat": {"max_daily": 2, "unit": "g"}
+    },
+    "fda_guidelines": {
+        "fiber": {"min_daily": 25, "unit": "g"},
+        "protein": {"min_daily": 50, "unit": "g"},
+        "vitamin_c": {"min_daily": 90, "unit": "mg"},
+        "calcium": {"min_daily": 1000, "unit": "mg"}
+    },
+    "medical_conditions": {
+        "diabetes": ["sugar", "carbohydrates", "glycemic_index"],
+        "hypertension": ["sodium", "potassium"],
+        "heart_disease": ["saturated_fat", "trans_fat", "cholesterol"],
+        "obesity": ["calories", "sugar", "saturated_fat"]
+    }
+}
+_MEDICAL_GUIDELINES_VIEW = MappingProxyType(_MEDICAL_GUIDELINES)
+
+# Keyword -> medical note lookup for _analyze_nutrients; first match wins
+_NUTRIENT_NOTES = (
+    ("sodium", "Essential for fluid balance, but excess can cause hypertension"),
+    ("sugar", "Provides energy but excess can lead to diabetes and obesity"),
+    ("protein", "Essential for muscle and tissue repair"),
+    ("fiber", "Important for digestive health and cholesterol management"),
+)
+_DEFAULT_NUTRIENT_NOTE = "Important for overall health and nutrition"
+
+_TS_CACHE = (0, "")
+
+def _timestamp() -> str:
+    """
+    ISO-8601 UTC timestamp at second resolution, cached per second
+
+    datetime.now().isoformat() constructs a fresh string per call, which
+    adds up when stamped onto every response; responses only need second
+    resolution, so the formatted string is reused until the clock ticks.
+    """
+    global _TS_CACHE
+    sec = time.time_ns() // 1_000_000_000
+    if sec != _TS_CACHE[0]:
+        _TS_CACHE = (
+            sec,
+            datetime.fromtimestamp(sec, tz=timezone.utc).isoformat(timespec='seconds')
+        )
+    return _TS_CACHE[1]
+
+_NUM_RE = re.compile(r'([-+]?\d*\.?\d+)')
+
+def _normalize_nutrition(nutrition_facts: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Parse nutrition values into floats once, stripping units
+
+    Handles already-numeric values as well as strings like "600mg"; values
+    without any digits map to NaN so threshold comparisons are simply false.
+    """
+    normalized = {}
+    for key, value in nutrition_facts.items():
+        if isinstance(value, (int, float)):
+            normalized[key.lower()] = float(value)
+            continue
+        match = _NUM_RE.search(str(value))
+        normalized[key.lower()] = float(match.group(1)) if match else math.nan
+    return normalized
+
+_JSON_STOP_CLS = None
+
+def _get_json_stop_class():
+    """
+    Define the JSONBraceStop stopping criteria on first use
+
+    Deferred to a factory because transformers is imported lazily, so the
+    subclass cannot be created at module import time.
+    """
+    global _JSON_STOP_CLS
+    if _JSON_STOP_CLS is not None:
+        return _JSON_STOP_CLS
+
+    from transformers import StoppingCriteria
+
+    class JSONBraceStop(StoppingCriteria):
+        """
+        Stop generation once the first top-level JSON object closes
+
+        The response format only needs the JSON between the outermost
+        braces, so there is no point decoding the remaining budget of
+        max_new_tokens. Each step decodes only the tokens generated since
+        the previous step and updates a running brace depth.
+        """
+
+        def __init__(self, tokenizer, prompt_len: int):
+            self.tokenizer = tokenizer
+            self.seen_len = prompt_len
+            self.depth = 0
+            self.opened = False
+
+        def __call__(self, input_ids, scores, **kwargs) -> bool:
+            new_text = self.tokenizer.decode(
+                input_ids[0, self.seen_len:], skip_special_tokens=True
+            )
+            self.seen_len = input_ids.shape[1]
+            for char in new_text:
+                if char == '{':
+                    self.depth += 1
+                    self.opened = True
+                elif char == '}':
+                    self.depth -= 1
+                    if self.opened and self.depth <= 0:
+                        return True
+            return False
+
+    _JSON_STOP_CLS = JSONBraceStop
+    return _JSON_STOP_CLS
+
+_TERM_AUTOMATON = None
+
+def _get_term_automaton():
+    """Build the Aho-Corasick automaton over ingredient terms (once)"""
+    global _TERM_AUTOMATON
+    if _TERM_AUTOMATON is None:
+        automaton = ahocorasick.Automaton()
+        for term in _INGREDIENT_TERMS:
+            automaton.add_word(term, term)
+        automaton.make_automaton()
+        _TERM_AUTOMATON = automaton
+    return _TERM_AUTOMATON
+
+@lru_cache(maxsize=4096)
+def _scan_ingredient_terms(ingredients: tuple) -> tuple:
+    """
+    Scan each ingredient once for all known terms
+
+    Returns one frozenset of matched terms per ingredient, replacing the
+    O(ingredients x keywords) substring loops that each scoring helper used
+    to run separately.
+    """
+    matched = []
+    for ingredient in ingredients:
+        ingredient_lower = ingredient.lower()
+        if AHOCORASICK_AVAILABLE:
+            terms = frozenset(
+                term for _, term in _get_term_automaton().iter(ingredient_lower)
+            )
+        else:
+            terms = set()
+            for term in _TERM_RE.findall(ingredient_lower):
+                terms.add(term)
+                terms |= _TERM_IMPLIES[term]
+            terms = frozenset(terms)
+        matched.append(terms)
+    return tuple(matched)
+
+@lru_cache(maxsize=4096)
+def _basic_health_score(ingredients: tuple, nutrition_items: tuple) -> int:
+    """
+    Cached basic health score over hashable ingredient/nutrition fingerprints
+    """
+    score = 100
+
+    # Check for harmful ingredients
+    for terms in _scan_ingredient_terms(ingredients):
+        score -= 10 * len(terms & _HARMFUL_TERMS)
+
+    # Check nutrition facts (values already parsed to floats)
+    nutrition_values = dict(nutrition_items)
+    sodium = nutrition_values.get("sodium")
+    if sodium is not None and sodium > 600:  # High sodium
+        score -= 15
+
+    sugar = nutrition_values.get("sugar")
+    if sugar is not None and sugar > 15:  # High sugar
+        score -= 20
+
+    return max(0, min(100, score))
+
 class MedicalLLMService:
     """
     Medical LLM Service using BioMistral 7B for food nutrition analysis
     """
-    
+
+    # Fixed prompt scaffolding: the intro and rubric never change between
+    # requests, so the prefix KV cache can be computed once and reused
+    _PROMPT_PREFIX = """<s>[INST] As a medical nutritionist with expertise in food science and clinical nutrition, analyze the following food product based on WHO, FDA, and peer-reviewed medical research:
+
+"""
+    _PROMPT_SUFFIX = """
+Please provide a comprehensive medical analysis including:
+
+1. HEALTH SCORE (0-100): Based on WHO/FDA guidelines and medical research
+2. MEDICAL CONCERNS: Potential health risks based on ingredients and nutrition
+3. NUTRIENT ANALYSIS: Detailed breakdown of each nutrient's medical significance
+4. CLINICAL RECOMMENDATIONS: Evidence-based recommendations for different health conditions
+5. CONTRAINDICATIONS: Medical conditions that should avoid this product
+6. EVIDENCE: Cite relevant medical studies and guidelines
+
+Format your response as structured JSON with medical accuracy and evidence-based insights.
+[/INST]"""
+
+    # Read-only view of the shared module-level guidelines table
+    MEDICAL_GUIDELINES = _MEDICAL_GUIDELINES_VIEW
+
     def __init__(self):
         # Try multiple medical LLM models in order of preference
         self.model_options = [
@@ -44,81 +342,147 @@ class MedicalLLMService:
         self.model_name = self.model_options[0]
         self.tokenizer = None
         self.model = None
-        self.pipeline = None
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        # Resolved against CUDA availability in load_model, once the ML
+        # dependencies have actually been imported
+        self.device = "cpu"
         self.is_loaded = False
-        
+
+        # Cached KV state for the fixed prompt prefix
+        self._prefix_ids = None
+        self._prefix_kv = None
+        self._prefix_len = 0
+
+        # Demo analyses are pure functions of their inputs, so repeat scans
+        # of the same product can be served from this fingerprint cache
+        self._demo_analysis_cache = {}
+
+        # Prompt templates specialized per nutrition-facts key schema; the
+        # key set rarely changes between requests, so the per-call work
+        # collapses to a single str.format over precomputed placeholders
+        self._variable_templates = {}
+
         # Medical nutrition guidelines and references
-        self.medical_guidelines = {
-            "who_guidelines": {
-                "sodium": {"max_daily": 2000, "unit": "mg"},
-                "sugar": {"max_daily": 50, "unit": "g"},
-                "saturated_fat": {"max_daily": 22, "unit": "g"},
-                "trans_fat": {"max_daily": 2, "unit": "g"}
-            },
-            "fda_guidelines": {
-                "fiber": {"min_daily": 25, "unit": "g"},
-                "protein": {"min_daily": 50, "unit": "g"},
-                "vitamin_c": {"min_daily": 90, "unit": "mg"},
-                "calcium": {"min_daily": 1000, "unit": "mg"}
-            },
-            "medical_conditions": {
-                "diabetes": ["sugar", "carbohydrates", "glycemic_index"],
-                "hypertension": ["sodium", "potassium"],
-                "heart_disease": ["saturated_fat", "trans_fat", "cholesterol"],
-                "obesity": ["calories", "sugar", "saturated_fat"]
-            }
-        }
+        self.medical_guidelines = self.MEDICAL_GUIDELINES
     
     def load_model(self) -> bool:
         """
         Load the BioMistral 7B model with optimized configuration
         """
-        if not ML_AVAILABLE:
+        if not _import_ml_dependencies():
             logger.info("ML dependencies not available, running in demo mode...")
             self.is_loaded = False
             return False
-            
+
         try:
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
             logger.info(f"Loading BioMistral 7B model on {self.device}...")
             
-            # Configure quantization for memory efficiency
-            quantization_config = BitsAndBytesConfig(
-                load_in_4bit=True,
-                bnb_4bit_compute_dtype=torch.float16,
-                bnb_4bit_use_double_quant=True,
-                bnb_4bit_quant_type="nf4"
-            )
-            
-            # Load tokenizer
+            # Choose compute dtype: bf16 is faster and more numerically
+            # stable than fp16 where the GPU supports it
+            bf16_supported = self.device == "cuda" and torch.cuda.is_bf16_supported()
+            compute_dtype = torch.bfloat16 if bf16_supported else torch.float16
+
+            # Only quantize to 4-bit NF4 when VRAM is actually tight -
+            # dequantization overhead makes NF4 slower than bf16/fp16
+            # whenever the full-precision weights fit. Deployers can force a
+            # mode with BIOMISTRAL_PRECISION=4bit|bf16|fp16.
+            use_4bit = False
+            if self.device == "cuda":
+                free_mem, total_mem = torch.cuda.mem_get_info()
+                use_4bit = total_mem < 24 * 1024 ** 3
+
+            precision_override = os.getenv('BIOMISTRAL_PRECISION', '').lower()
+            if precision_override == '4bit':
+                use_4bit = True
+            elif precision_override == 'bf16':
+                use_4bit = False
+                compute_dtype = torch.bfloat16 if bf16_supported else torch.float16
+            elif precision_override == 'fp16':
+                use_4bit = False
+                compute_dtype = torch.float16
+
+            # Double quantization saves ~0.4 bits/param but adds an extra
+            # dequant step per matmul - a bad trade for latency-bound single
+            # requests, so it is off unless BIOMISTRAL_DOUBLE_QUANT=1
+            quantization_config = None
+            if use_4bit:
+                quantization_config = BitsAndBytesConfig(
+                    load_in_4bit=True,
+                    bnb_4bit_compute_dtype=compute_dtype,
+                    bnb_4bit_use_double_quant=os.getenv('BIOMISTRAL_DOUBLE_QUANT', '0') == '1',
+                    bnb_4bit_quant_type="nf4"
+                )
+
+            # Pin downloads to a local cache directory; once it exists,
+            # skip the network probes entirely on warm starts
+            cache_dir = os.environ.get("HF_MODELS_CACHE", "./models_cache")
+            local_files_only = os.path.exists(cache_dir)
+
+            # Load tokenizer. BioMistral is a plain Mistral architecture, so
+            # no remote modeling code is needed; left padding only matters
+            # for the batched path (single requests are never padded).
             self.tokenizer = AutoTokenizer.from_pretrained(
                 self.model_name,
-                trust_remote_code=True,
+                use_fast=True,
+                trust_remote_code=False,
+                cache_dir=cache_dir,
+                local_files_only=local_files_only,
                 padding_side="left"
             )
-            
+
             # Add padding token if not present
             if self.tokenizer.pad_token is None:
                 self.tokenizer.pad_token = self.tokenizer.eos_token
-            
-            # Load model with quantization
+
+            # Load model with quantization and PyTorch SDPA attention
             self.model = AutoModelForCausalLM.from_pretrained(
                 self.model_name,
                 quantization_config=quantization_config if self.device == "cuda" else None,
                 device_map="auto" if self.device == "cuda" else None,
-                trust_remote_code=True,
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32
+                trust_remote_code=False,
+                cache_dir=cache_dir,
+                local_files_only=local_files_only,
+                low_cpu_mem_usage=True,
+                torch_dtype=compute_dtype if self.device == "cuda" else torch.float32,
+                attn_implementation="sdpa"
             )
-            
-            # Create pipeline for text generation
-            self.pipeline = pipeline(
-                "text-generation",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                device_map="auto" if self.device == "cuda" else None,
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32
+            self.model.eval()
+            # Some BnB configurations disable the KV cache by default,
+            # which would force full-sequence recompute on every decode step
+            self.model.config.use_cache = True
+
+            # Opt-in CUDA-graph decode: with a static KV cache every decode
+            # step has constant tensor shapes, so torch.compile can capture
+            # the step as a CUDA graph and skip per-kernel launch overhead.
+            # That cache implementation cannot share state between requests,
+            # so it is mutually exclusive with the prefix KV cache below and
+            # stays behind BIOMISTRAL_CUDA_GRAPHS=1.
+            use_cuda_graphs = (
+                self.device == "cuda"
+                and os.getenv('BIOMISTRAL_CUDA_GRAPHS', '0') == '1'
             )
-            
+
+            # Compile the (possibly quantized) matmuls with static shapes;
+            # without the flag, cudagraphs stay off because the cached-prefix
+            # path reuses and mutates past_key_values between requests
+            try:
+                if use_cuda_graphs:
+                    self.model.generation_config.cache_implementation = "static"
+                    self.model = torch.compile(
+                        self.model, mode="max-autotune", dynamic=False
+                    )
+                else:
+                    self.model = torch.compile(
+                        self.model, mode="max-autotune-no-cudagraphs", dynamic=False
+                    )
+            except Exception as e:
+                logger.warning(f"torch.compile unavailable: {str(e)}")
+
+            # Precompute the KV cache for the fixed prompt prefix so each
+            # request only pays prefill cost for its variable portion
+            if not use_cuda_graphs:
+                self._precompute_prefix_cache()
+
             self.is_loaded = True
             logger.info("BioMistral 7B model loaded successfully!")
             return True
@@ -141,59 +505,211 @@ class MedicalLLMService:
             return self._get_demo_analysis(product_name, ingredients, nutrition_facts)
         
         try:
-            # Create medical analysis prompt
-            prompt = self._create_medical_prompt(product_name, ingredients, nutrition_facts)
-            
-            # Generate medical analysis
-            response = self.pipeline(
-                prompt,
-                max_new_tokens=512,
-                temperature=0.3,
-                do_sample=True,
-                pad_token_id=self.tokenizer.eos_token_id,
-                eos_token_id=self.tokenizer.eos_token_id
-            )
-            
+            # Generate medical analysis, reusing the cached prefix KV state
+            # when available to skip re-prefilling the fixed instructions
+            if self._prefix_kv is not None:
+                generated_text = self._generate_with_prefix_cache(
+                    product_name, ingredients, nutrition_facts
+                )
+            else:
+                prompt = self._create_medical_prompt(product_name, ingredients, nutrition_facts)
+                inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+                with torch.inference_mode():
+                    output = self.model.generate(
+                        **inputs,
+                        max_new_tokens=512,
+                        temperature=0.3,
+                        do_sample=True,
+                        pad_token_id=self.tokenizer.eos_token_id,
+                        eos_token_id=self.tokenizer.eos_token_id,
+                        use_cache=True,
+                        stopping_criteria=self._json_stop_criteria(inputs.input_ids.shape[1])
+                    )
+                generated_text = self.tokenizer.decode(output[0], skip_special_tokens=True)
+
             # Parse the response
-            analysis = self._parse_medical_response(response[0]['generated_text'])
-            
+            analysis = self._parse_medical_response(generated_text)
+
             return analysis
-            
+
         except Exception as e:
             logger.error(f"Error in medical analysis: {str(e)}")
             return self._get_demo_analysis(product_name, ingredients, nutrition_facts)
-    
-    def _create_medical_prompt(self, 
-                              product_name: str, 
-                              ingredients: List[str], 
+
+    def analyze_food_nutrition_batch(self,
+                                    items: List[Tuple[str, List[str], Dict[str, Any]]],
+                                    batch_size: int = 8) -> List[Dict[str, Any]]:
+        """
+        Analyze multiple products with batched generation
+
+        Each item is a (product_name, ingredients, nutrition_facts) tuple.
+        Prompts are left-padded and generated together so prefill and
+        kernel-launch overhead is amortized across the batch.
+        """
+        if not self.is_loaded:
+            return [self._get_demo_analysis(*item) for item in items]
+
+        try:
+            results = []
+            for start in range(0, len(items), batch_size):
+                chunk = items[start:start + batch_size]
+                prompts = [self._create_medical_prompt(*item) for item in chunk]
+                inputs = self.tokenizer(
+                    prompts, return_tensors="pt", padding=True
+                ).to(self.model.device)
+
+                with torch.inference_mode():
+                    output = self.model.generate(
+                        **inputs,
+                        max_new_tokens=512,
+                        temperature=0.3,
+                        do_sample=True,
+                        pad_token_id=self.tokenizer.eos_token_id,
+                        eos_token_id=self.tokenizer.eos_token_id,
+                        use_cache=True
+                    )
+
+                prompt_len = inputs.input_ids.shape[1]
+                for row in output:
+                    generated_text = self.tokenizer.decode(
+                        row[prompt_len:], skip_special_tokens=True
+                    )
+                    results.append(self._parse_medical_response(generated_text))
+
+            return results
+
+        except Exception as e:
+            logger.error(f"Error in batched medical analysis: {str(e)}")
+            return [self._get_demo_analysis(*item) for item in items]
+
+    def analyze_food_nutrition_bulk(self, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Analyze many products in one call
+
+        Each product dict carries "product_name", "ingredients" and
+        "nutrition_facts". With the model loaded this feeds the batched
+        generate path; in demo mode every product goes through the cached
+        single-pass scoring helpers, so repeat products across uploads are
+        served straight from cache.
+        """
+        items = [
+            (
+                product.get("product_name", "Unknown"),
+                product.get("ingredients", []),
+                product.get("nutrition_facts", {})
+            )
+            for product in products
+        ]
+
+        if self.is_loaded:
+            return self.analyze_food_nutrition_batch(items)
+
+        return [self._get_demo_analysis(*item) for item in items]
+
+    def _create_medical_prompt(self,
+                              product_name: str,
+                              ingredients: List[str],
                               nutrition_facts: Dict[str, Any]) -> str:
         """
         Create a medical-grade prompt for food analysis
         """
-        prompt = f"""<s>[INST] As a medical nutritionist with expertise in food science and clinical nutrition, analyze the following food product based on WHO, FDA, and peer-reviewed medical research:
+        return (
+            self._PROMPT_PREFIX
+            + self._variable_part(product_name, ingredients, nutrition_facts)
+            + self._PROMPT_SUFFIX
+        )
 
-Product: {product_name}
-Ingredients: {', '.join(ingredients)}
-Nutrition Facts (per 100g):
-"""
-        
-        for nutrient, value in nutrition_facts.items():
-            prompt += f"- {nutrient}: {value}\n"
-        
-        prompt += """
-Please provide a comprehensive medical analysis including:
+    def _variable_part(self,
+                      product_name: str,
+                      ingredients: List[str],
+                      nutrition_facts: Dict[str, Any]) -> str:
+        """
+        Build the per-request portion of the medical prompt
 
-1. HEALTH SCORE (0-100): Based on WHO/FDA guidelines and medical research
-2. MEDICAL CONCERNS: Potential health risks based on ingredients and nutrition
-3. NUTRIENT ANALYSIS: Detailed breakdown of each nutrient's medical significance
-4. CLINICAL RECOMMENDATIONS: Evidence-based recommendations for different health conditions
-5. CONTRAINDICATIONS: Medical conditions that should avoid this product
-6. EVIDENCE: Cite relevant medical studies and guidelines
+        The line layout only depends on the nutrition-facts key schema, so a
+        format template is compiled once per distinct key tuple and repeat
+        calls just substitute the values.
+        """
+        keys = tuple(nutrition_facts.keys())
+        template = self._variable_templates.get(keys)
+        if template is None:
+            lines = [
+                "Product: {0}",
+                "Ingredients: {1}",
+                "Nutrition Facts (per 100g):",
+            ]
+            lines.extend(
+                "- %s: {%d}" % (key.replace('{', '{{').replace('}', '}}'), i + 2)
+                for i, key in enumerate(keys)
+            )
+            template = "\n".join(lines) + "\n"
+            if len(self._variable_templates) < 256:
+                self._variable_templates[keys] = template
+        return template.format(product_name, ', '.join(ingredients), *nutrition_facts.values())
 
-Format your response as structured JSON with medical accuracy and evidence-based insights.
-[/INST]"""
-        
-        return prompt
+    def _json_stop_criteria(self, prompt_len: int):
+        """
+        Build a fresh stopping-criteria list that halts on a closed JSON object
+        """
+        from transformers import StoppingCriteriaList
+        return StoppingCriteriaList([_get_json_stop_class()(self.tokenizer, prompt_len)])
+
+    def _precompute_prefix_cache(self) -> None:
+        """
+        Tokenize the fixed prompt prefix once and cache its KV state
+        """
+        try:
+            prefix_ids = self.tokenizer(
+                self._PROMPT_PREFIX, return_tensors="pt"
+            ).input_ids.to(self.model.device)
+
+            with torch.no_grad():
+                output = self.model(input_ids=prefix_ids, use_cache=True)
+
+            self._prefix_ids = prefix_ids
+            self._prefix_kv = output.past_key_values
+            self._prefix_len = prefix_ids.shape[1]
+            logger.info(f"Cached prompt prefix KV state ({self._prefix_len} tokens)")
+
+        except Exception as e:
+            logger.warning(f"Prompt prefix KV cache unavailable: {str(e)}")
+            self._prefix_ids = None
+            self._prefix_kv = None
+            self._prefix_len = 0
+
+    def _generate_with_prefix_cache(self,
+                                   product_name: str,
+                                   ingredients: List[str],
+                                   nutrition_facts: Dict[str, Any]) -> str:
+        """
+        Generate a medical analysis reusing the cached prompt-prefix KV state
+        """
+        variable_text = (
+            self._variable_part(product_name, ingredients, nutrition_facts)
+            + self._PROMPT_SUFFIX
+        )
+        variable_ids = self.tokenizer(
+            variable_text, return_tensors="pt", add_special_tokens=False
+        ).input_ids.to(self.model.device)
+
+        input_ids = torch.cat([self._prefix_ids, variable_ids], dim=1)
+        attention_mask = torch.ones_like(input_ids)
+
+        # Copy the cached KV state so generation doesn't mutate the original
+        with torch.inference_mode():
+            output = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=copy.deepcopy(self._prefix_kv),
+                max_new_tokens=512,
+                temperature=0.3,
+                do_sample=True,
+                pad_token_id=self.tokenizer.eos_token_id,
+                eos_token_id=self.tokenizer.eos_token_id,
+                stopping_criteria=self._json_stop_criteria(input_ids.shape[1])
+            )
+
+        return self.tokenizer.decode(output[0], skip_special_tokens=True)
     
     def _parse_medical_response(self, response: str) -> Dict[str, Any]:
         """
@@ -201,9 +717,9 @@ Format your response as structured JSON with medical accuracy and evidence-based
         """
         try:
             # Extract JSON from response
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                analysis = json.loads(json_match.group())
+            json_blob = _extract_json(response)
+            if json_blob:
+                analysis = json.loads(json_blob)
             else:
                 # Fallback parsing
                 analysis = self._fallback_parse(response)
@@ -222,18 +738,18 @@ Format your response as structured JSON with medical accuracy and evidence-based
         Fallback parsing when JSON extraction fails
         """
         # Extract health score
-        score_match = re.search(r'HEALTH SCORE[:\s]*(\d+)', response, re.IGNORECASE)
+        score_match = _SCORE_RE.search(response)
         health_score = int(score_match.group(1)) if score_match else 75
-        
+
         # Extract medical concerns
-        concerns_match = re.search(r'MEDICAL CONCERNS[:\s]*(.*?)(?=NUTRIENT ANALYSIS|CLINICAL RECOMMENDATIONS|$)', response, re.IGNORECASE | re.DOTALL)
+        concerns_match = _CONCERNS_RE.search(response)
         medical_concerns = concerns_match.group(1).strip() if concerns_match else "No significant medical concerns identified."
         
         return {
             "health_score": health_score,
             "medical_concerns": medical_concerns,
             "analysis": response,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _timestamp(),
             "model_used": "BioMistral-7B"
         }
     
@@ -241,7 +757,7 @@ Format your response as structured JSON with medical accuracy and evidence-based
         """
         Enhance analysis with medical guidelines and references
         """
-        analysis["medical_guidelines"] = self.medical_guidelines
+        analysis["medical_guidelines"] = _MEDICAL_GUIDELINES
         analysis["evidence_sources"] = [
             "WHO Guidelines on Nutrition",
             "FDA Food Safety Guidelines", 
@@ -249,88 +765,82 @@ Format your response as structured JSON with medical accuracy and evidence-based
             "Clinical Nutrition Studies"
         ]
         analysis["model_used"] = "BioMistral-7B"
-        analysis["timestamp"] = datetime.now().isoformat()
+        analysis["timestamp"] = _timestamp()
         
         return analysis
     
-    def _get_demo_analysis(self, 
-                          product_name: str, 
-                          ingredients: List[str], 
+    def _get_demo_analysis(self,
+                          product_name: str,
+                          ingredients: List[str],
                           nutrition_facts: Dict[str, Any]) -> Dict[str, Any]:
         """
         Demo analysis when model is not available
         """
-        # Basic health scoring based on ingredients and nutrition
-        health_score = self._calculate_basic_health_score(ingredients, nutrition_facts)
-        
-        return {
-            "health_score": health_score,
-            "medical_concerns": self._get_medical_concerns(ingredients, nutrition_facts),
-            "nutrient_analysis": self._analyze_nutrients(nutrition_facts),
-            "clinical_recommendations": self._get_clinical_recommendations(health_score),
-            "contraindications": self._get_contraindications(ingredients),
-            "evidence_sources": [
-                "WHO Guidelines on Nutrition",
-                "FDA Food Safety Guidelines",
-                "PubMed Medical Research"
-            ],
-            "model_used": "Demo Mode (BioMistral-7B not available)",
-            "timestamp": datetime.now().isoformat(),
-            "medical_guidelines": self.medical_guidelines
-        }
-    
-    def _calculate_basic_health_score(self, ingredients: List[str], nutrition_facts: Dict[str, Any]) -> int:
+        # Serve repeat scans of the same product from the fingerprint cache
+        cache_key = (
+            product_name,
+            tuple(ingredients),
+            tuple(sorted((k, str(v)) for k, v in nutrition_facts.items()))
+        )
+        cached = self._demo_analysis_cache.get(cache_key)
+
+        if cached is None:
+            # Parse numeric nutrition values once for all scoring helpers
+            nutrition_values = _normalize_nutrition(nutrition_facts)
+
+            # Basic health scoring based on ingredients and nutrition
+            health_score = self._calculate_basic_health_score(ingredients, nutrition_values)
+
+            cached = {
+                "health_score": health_score,
+                "medical_concerns": self._get_medical_concerns(ingredients, nutrition_values),
+                "nutrient_analysis": self._analyze_nutrients(nutrition_facts),
+                "clinical_recommendations": self._get_clinical_recommendations(health_score),
+                "contraindications": self._get_contraindications(ingredients),
+                "evidence_sources": [
+                    "WHO Guidelines on Nutrition",
+                    "FDA Food Safety Guidelines",
+                    "PubMed Medical Research"
+                ],
+                "model_used": "Demo Mode (BioMistral-7B not available)",
+                "medical_guidelines": _MEDICAL_GUIDELINES
+            }
+            if len(self._demo_analysis_cache) < 4096:
+                self._demo_analysis_cache[cache_key] = cached
+
+        # Only the timestamp differs between identical requests
+        analysis = dict(cached)
+        analysis["timestamp"] = _timestamp()
+        return analysis
+
+    def _calculate_basic_health_score(self, ingredients: List[str], nutrition_values: Dict[str, float]) -> int:
         """
-        Calculate basic health score based on ingredients and nutrition
+        Calculate basic health score based on ingredients and parsed nutrition values
         """
-        score = 100
-        
-        # Check for harmful ingredients
-        harmful_ingredients = [
-            "artificial sweetener", "high fructose corn syrup", "trans fat",
-            "sodium benzoate", "artificial color", "preservative"
-        ]
-        
-        for ingredient in ingredients:
-            ingredient_lower = ingredient.lower()
-            for harmful in harmful_ingredients:
-                if harmful in ingredient_lower:
-                    score -= 10
-        
-        # Check nutrition facts
-        if "sodium" in nutrition_facts:
-            sodium = float(nutrition_facts["sodium"].replace("mg", "").strip())
-            if sodium > 600:  # High sodium
-                score -= 15
-        
-        if "sugar" in nutrition_facts:
-            sugar = float(nutrition_facts["sugar"].replace("g", "").strip())
-            if sugar > 15:  # High sugar
-                score -= 20
-        
-        return max(0, min(100, score))
+        return _basic_health_score(
+            tuple(ingredient.lower() for ingredient in ingredients),
+            tuple(sorted(nutrition_values.items()))
+        )
     
-    def _get_medical_concerns(self, ingredients: List[str], nutrition_facts: Dict[str, Any]) -> str:
+    def _get_medical_concerns(self, ingredients: List[str], nutrition_values: Dict[str, float]) -> str:
         """
-        Identify medical concerns based on ingredients and nutrition
+        Identify medical concerns based on ingredients and parsed nutrition values
         """
         concerns = []
-        
+
         # Check for high sodium
-        if "sodium" in nutrition_facts:
-            sodium = float(nutrition_facts["sodium"].replace("mg", "").strip())
-            if sodium > 600:
-                concerns.append("High sodium content may contribute to hypertension")
-        
+        sodium = nutrition_values.get("sodium")
+        if sodium is not None and sodium > 600:
+            concerns.append("High sodium content may contribute to hypertension")
+
         # Check for high sugar
-        if "sugar" in nutrition_facts:
-            sugar = float(nutrition_facts["sugar"].replace("g", "").strip())
-            if sugar > 15:
-                concerns.append("High sugar content may increase diabetes risk")
+        sugar = nutrition_values.get("sugar")
+        if sugar is not None and sugar > 15:
+            concerns.append("High sugar content may increase diabetes risk")
         
         # Check ingredients
-        for ingredient in ingredients:
-            if "artificial" in ingredient.lower():
+        for terms in _scan_ingredient_terms(tuple(ingredients)):
+            if "artificial" in terms:
                 concerns.append("Contains artificial ingredients with potential health risks")
         
         return "; ".join(concerns) if concerns else "No significant medical concerns identified."
@@ -340,19 +850,14 @@ Format your response as structured JSON with medical accuracy and evidence-based
         Analyze individual nutrients
         """
         analysis = {}
-        
-        for nutrient, value in nutrition_facts.items():
-            if "sodium" in nutrient.lower():
-                analysis[nutrient] = "Essential for fluid balance, but excess can cause hypertension"
-            elif "sugar" in nutrient.lower():
-                analysis[nutrient] = "Provides energy but excess can lead to diabetes and obesity"
-            elif "protein" in nutrient.lower():
-                analysis[nutrient] = "Essential for muscle and tissue repair"
-            elif "fiber" in nutrient.lower():
-                analysis[nutrient] = "Important for digestive health and cholesterol management"
-            else:
-                analysis[nutrient] = "Important for overall health and nutrition"
-        
+
+        for nutrient in nutrition_facts:
+            nutrient_lower = nutrient.lower()
+            analysis[nutrient] = next(
+                (note for keyword, note in _NUTRIENT_NOTES if keyword in nutrient_lower),
+                _DEFAULT_NUTRIENT_NOTE
+            )
+
         return analysis
     
     def _get_clinical_recommendations(self, health_score: int) -> List[str]:
@@ -383,17 +888,25 @@ Format your response as structured JSON with medical accuracy and evidence-based
         Get medical contraindications
         """
         contraindications = []
-        
-        for ingredient in ingredients:
-            ingredient_lower = ingredient.lower()
-            if "artificial sweetener" in ingredient_lower:
+
+        for terms in _scan_ingredient_terms(tuple(ingredients)):
+            if "artificial sweetener" in terms:
                 contraindications.append("May not be suitable for individuals with phenylketonuria")
-            elif "sodium" in ingredient_lower:
+            elif "sodium" in terms:
                 contraindications.append("Avoid if you have hypertension or heart disease")
-            elif "sugar" in ingredient_lower:
+            elif "sugar" in terms:
                 contraindications.append("Limit if you have diabetes or prediabetes")
         
         return contraindications if contraindications else ["No specific contraindications identified"]
 
-# Global instance
-medical_llm_service = MedicalLLMService()
+# Lazily constructed global instance
+_instance: Optional[MedicalLLMService] = None
+
+def get_medical_llm_service() -> MedicalLLMService:
+    """
+    Return the shared MedicalLLMService instance, constructing it on first use
+    """
+    global _instance
+    if _instance is None:
+        _instance = MedicalLLMService()
+    return _instance
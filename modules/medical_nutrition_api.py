@@ -1,8 +1,392 @@
+import asyncio
+import hashlib
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter, Retry
 import json
+import re
+import sys
+import time
 from typing import Dict, List, Any, Optional
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from types import MappingProxyType
+
+# httpx powers the async lookup variants; the sync requests path works
+# without it
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# orjson decodes large USDA payloads several times faster than stdlib
+# json; fall back to the responses' own .json() when it is not installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def _decode_json_response(response) -> Any:
+    """Decode an HTTP response body, preferring orjson over stdlib json"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(response.content)
+    return response.json()
+
+# ijson enables stream-parsing of large USDA payloads; the buffered
+# json path is used when it is not installed
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+# Redis backs the shared lookup cache when REDIS_URL is set; otherwise an
+# in-process dict cache is used
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Cache TTLs: barcodes map to stable products, so hits can live for days;
+# misses expire quickly so newly listed products show up
+_CACHE_TTL_HIT = 7 * 24 * 3600
+_CACHE_TTL_MISS = 3600
+
+# USDA nutrient-name -> standard key mapping rules, checked in order with
+# first match winning. Each rule is (alternatives, standard_key) where an
+# alternative is a tuple of substrings that must all appear in the
+# lowercased nutrient name. Order mirrors the original elif chain.
+_USDA_NUTRIENT_RULES = (
+    ((('energy', 'kcal'),), 'calories'),
+    ((('protein',),), 'protein'),
+    ((('total lipid',), ('fat',)), 'total_fat'),
+    ((('saturated', 'fat'),), 'saturated_fat'),
+    ((('trans', 'fat'),), 'trans_fat'),
+    ((('sodium',),), 'sodium'),
+    ((('carbohydrate', 'by difference'),), 'total_carbohydrate'),
+    ((('fiber', 'total dietary'),), 'dietary_fiber'),
+    ((('sugars', 'total'),), 'total_sugars'),
+    ((('cholesterol',),), 'cholesterol'),
+    ((('calcium',),), 'calcium'),
+    ((('iron',),), 'iron'),
+    ((('potassium',),), 'potassium'),
+    ((('vitamin c',),), 'vitamin_c'),
+    ((('vitamin d',),), 'vitamin_d'),
+)
+
+# OpenFoodFacts nutriment key -> standard key mapping, built once.
+# Iteration goes over the nutriments actually present in a product, so
+# each result costs one dict lookup per nutriment instead of a membership
+# test per mapping entry.
+_OFF_NUTRIENT_MAP = {
+    'energy-kcal_100g': 'calories',
+    'proteins_100g': 'protein',
+    'carbohydrates_100g': 'total_carbohydrate',
+    'sugars_100g': 'total_sugars',
+    'fat_100g': 'total_fat',
+    'saturated-fat_100g': 'saturated_fat',
+    'trans-fat_100g': 'trans_fat',
+    'sodium_100g': 'sodium',
+    'fiber_100g': 'dietary_fiber',
+    'cholesterol_100g': 'cholesterol',
+    'calcium_100g': 'calcium',
+    'iron_100g': 'iron',
+    'potassium_100g': 'potassium',
+    'vitamin-c_100g': 'vitamin_c',
+    'vitamin-d_100g': 'vitamin_d'
+}
+
+# Intern the standard nutrient keys once so the hot result-processing
+# loops store into the nutrition dicts with identity-hashed keys
+_USDA_NUTRIENT_RULES = tuple(
+    (alternatives, sys.intern(key)) for alternatives, key in _USDA_NUTRIENT_RULES
+)
+_OFF_NUTRIENT_MAP = {
+    off_key: sys.intern(standard_key)
+    for off_key, standard_key in _OFF_NUTRIENT_MAP.items()
+}
+
+# Demo catalog, built once at module scope instead of per call. The inner
+# dicts stay plain (not proxied) so demo results remain JSON-serializable
+# for the lookup cache; treat them as read-only.
+_DEMO_PRODUCTS = {
+    '5449000000996': {  # Coca Cola
+        'product_name': 'Coca Cola Classic',
+        'nutrition': {
+            'calories': 42.0,
+            'protein': 0.0,
+            'total_fat': 0.0,
+            'saturated_fat': 0.0,
+            'trans_fat': 0.0,
+            'cholesterol': 0.0,
+            'sodium': 1.0,
+            'total_carbohydrate': 10.6,
+            'dietary_fiber': 0.0,
+            'total_sugars': 10.6,
+            'added_sugars': 10.6,
+            'calcium': 0.0,
+            'iron': 0.0,
+            'potassium': 0.0
+        },
+        'ingredients': [
+            'carbonated water',
+            'sugar',
+            'caramel color',
+            'phosphoric acid',
+            'natural flavors',
+            'caffeine'
+        ]
+    },
+    '3017620422003': {  # Nutella
+        'product_name': 'Nutella Hazelnut Spread',
+        'nutrition': {
+            'calories': 546.0,
+            'protein': 7.3,
+            'total_fat': 30.0,
+            'saturated_fat': 18.0,
+            'trans_fat': 0.0,
+            'cholesterol': 0.0,
+            'sodium': 0.1,
+            'total_carbohydrate': 59.4,
+            'dietary_fiber': 3.4,
+            'total_sugars': 47.0,
+            'added_sugars': 47.0,
+            'calcium': 0.0,
+            'iron': 0.0,
+            'potassium': 0.0
+        },
+        'ingredients': [
+            'sugar',
+            'palm oil',
+            'hazelnuts',
+            'cocoa powder',
+            'skimmed milk powder',
+            'lecithin',
+            'vanillin'
+        ]
+    }
+}
+
+_GENERIC_DEMO_NUTRITION = {
+    'calories': 250.0,
+    'protein': 10.0,
+    'total_fat': 15.0,
+    'saturated_fat': 5.0,
+    'trans_fat': 0.0,
+    'cholesterol': 0.0,
+    'sodium': 300.0,
+    'total_carbohydrate': 30.0,
+    'dietary_fiber': 5.0,
+    'total_sugars': 10.0,
+    'added_sugars': 5.0,
+    'calcium': 100.0,
+    'iron': 2.0,
+    'potassium': 200.0
+}
+
+_GENERIC_DEMO_INGREDIENTS = [
+    'water',
+    'wheat flour',
+    'sugar',
+    'vegetable oil',
+    'salt',
+    'yeast',
+    'natural flavors'
+]
+
+_BREAD_DEMO_NUTRITION = {
+    'calories': 247.0,
+    'protein': 13.4,
+    'total_fat': 4.2,
+    'saturated_fat': 0.9,
+    'trans_fat': 0.0,
+    'cholesterol': 0.0,
+    'sodium': 681.0,
+    'total_carbohydrate': 41.0,
+    'dietary_fiber': 7.0,
+    'total_sugars': 5.0,
+    'added_sugars': 2.0,
+    'calcium': 100.0,
+    'iron': 2.5,
+    'potassium': 200.0
+}
+
+_BREAD_DEMO_INGREDIENTS = [
+    'whole wheat flour',
+    'water',
+    'yeast',
+    'salt',
+    'sugar',
+    'vegetable oil',
+    'preservative'
+]
+
+# Ingredient-list separator: commas or semicolons with surrounding
+# whitespace consumed by the pattern. maxsplit bounds the work on very
+# long labels since only the first 20 ingredients are kept anyway.
+_INGREDIENT_SPLIT = re.compile(r'\s*[,;]\s*')
+
+# Health-recommendation thresholds per 100g, in recommendation order.
+# A value above hi or below lo triggers a message; for fiber and protein
+# the polarity is inverted (high is good, low is the warning).
+_REC_NUTRIENTS = ('total_sugars', 'sodium', 'saturated_fat', 'dietary_fiber', 'protein')
+_REC_LO = np.array([5, 120, 1.5, 1, 3], dtype=np.float32)
+_REC_HI = np.array([15, 400, 5, 3, 10], dtype=np.float32)
+_REC_HIGH_IS_GOOD = np.array([False, False, False, True, True])
+
+# (warn, good) message templates matching _REC_NUTRIENTS order
+_REC_TEMPLATES = (
+    ("⚠️ High sugar content ({v}g/100g). WHO recommends <10% of daily calories from sugar.",
+     "✅ Low sugar content ({v}g/100g). Good choice for sugar control."),
+    ("⚠️ High sodium content ({v}mg/100g). May contribute to high blood pressure.",
+     "✅ Low sodium content ({v}mg/100g). Good for heart health."),
+    ("⚠️ High saturated fat ({v}g/100g). Limit for heart health.",
+     "✅ Low saturated fat ({v}g/100g). Good for cardiovascular health."),
+    ("⚠️ Low fiber content ({v}g/100g). Consider adding fiber-rich foods.",
+     "✅ Good fiber content ({v}g/100g). Supports digestive health."),
+    ("ℹ️ Low protein content ({v}g/100g). Consider protein-rich alternatives.",
+     "✅ Good protein content ({v}g/100g). Supports muscle health."),
+)
+
+# Medical nutrition guidelines (WHO, FDA, AHA, etc.). Frozen read-only
+# views so the table is built once, shared safely across instances and
+# threads, and cannot be mutated through get_medical_guidelines.
+_MEDICAL_GUIDELINES = MappingProxyType({
+    'daily_values': MappingProxyType({
+        'calories': 2000,
+        'total_fat': 65,  # g
+        'saturated_fat': 20,  # g
+        'trans_fat': 0,  # g (should be minimal)
+        'cholesterol': 300,  # mg
+        'sodium': 2300,  # mg
+        'total_carbohydrate': 300,  # g
+        'dietary_fiber': 25,  # g
+        'total_sugars': 50,  # g (WHO recommends <10% of calories)
+        'added_sugars': 25,  # g
+        'protein': 50,  # g
+        'vitamin_d': 20,  # mcg
+        'calcium': 1300,  # mg
+        'iron': 18,  # mg
+        'potassium': 4700,  # mg
+        'vitamin_c': 90,  # mg
+        'vitamin_a': 900,  # mcg
+        'vitamin_e': 15,  # mg
+        'vitamin_k': 120,  # mcg
+        'thiamin': 1.2,  # mg
+        'riboflavin': 1.3,  # mg
+        'niacin': 16,  # mg
+        'vitamin_b6': 1.7,  # mg
+        'folate': 400,  # mcg
+        'vitamin_b12': 2.4,  # mcg
+        'biotin': 30,  # mcg
+        'pantothenic_acid': 5,  # mg
+        'phosphorus': 1250,  # mg
+        'iodine': 150,  # mcg
+        'magnesium': 420,  # mg
+        'zinc': 11,  # mg
+        'selenium': 55,  # mcg
+        'copper': 0.9,  # mg
+        'manganese': 2.3,  # mg
+        'chromium': 35,  # mcg
+        'molybdenum': 45,  # mcg
+        'chloride': 2300,  # mg
+    }),
+    'who_guidelines': MappingProxyType({
+        'sugar_percentage': 10,  # % of total energy intake
+        'sodium_max': 2000,  # mg per day
+        'saturated_fat_percentage': 10,  # % of total energy intake
+        'trans_fat_percentage': 1,  # % of total energy intake
+        'fiber_min': 25,  # g per day
+    }),
+    'fda_guidelines': MappingProxyType({
+        'added_sugars_max': 50,  # g per day
+        'sodium_max': 2300,  # mg per day
+        'saturated_fat_max': 20,  # g per day
+    })
+})
+
+@lru_cache(maxsize=64)
+def _demo_by_barcode(barcode: str) -> Dict[str, Any]:
+    """
+    Build a demo result for a barcode, memoized per barcode
+
+    Callers treat results as read-only, so the cached dict is returned
+    as-is instead of being rebuilt from literals on every call.
+    """
+    product_data = _DEMO_PRODUCTS.get(barcode)
+    if product_data is not None:
+        return {
+            'product_name': product_data['product_name'],
+            'barcode': barcode,
+            'brand': 'Demo Brand',
+            'nutrition': product_data['nutrition'],
+            'ingredients': product_data['ingredients'],
+            'serving_size': '100g',
+            'source': 'Demo Data',
+            'raw_data': product_data
+        }
+
+    # Generic demo product
+    return {
+        'product_name': f'Demo Product {barcode}',
+        'barcode': barcode,
+        'brand': 'Demo Brand',
+        'nutrition': _GENERIC_DEMO_NUTRITION,
+        'ingredients': _GENERIC_DEMO_INGREDIENTS,
+        'serving_size': '100g',
+        'source': 'Demo Data',
+        'raw_data': {}
+    }
+
+@lru_cache(maxsize=64)
+def _demo_by_name(name: str) -> Dict[str, Any]:
+    """Build a demo result for a product name, memoized per name"""
+    name_lower = name.lower()
+
+    # Check for common product names
+    if 'coca' in name_lower or 'cola' in name_lower:
+        return _demo_by_barcode('5449000000996')
+    elif 'nutella' in name_lower:
+        return _demo_by_barcode('3017620422003')
+    elif 'bread' in name_lower:
+        return {
+            'product_name': f'Whole Grain Bread - {name}',
+            'barcode': '',
+            'brand': 'Demo Brand',
+            'nutrition': _BREAD_DEMO_NUTRITION,
+            'ingredients': _BREAD_DEMO_INGREDIENTS,
+            'serving_size': '100g',
+            'source': 'Demo Data',
+            'raw_data': {}
+        }
+    else:
+        # Generic demo product
+        return _demo_by_barcode('0000000000000')
+
+# Daily values packed once into an array so whole nutrition dicts can be
+# converted to DV% in one vectorized pass; zeros become inf so the
+# division yields 0% instead of a divide warning
+_DV_KEYS = tuple(_MEDICAL_GUIDELINES['daily_values'])
+_DV_VALUES = np.fromiter(
+    (_MEDICAL_GUIDELINES['daily_values'][k] for k in _DV_KEYS), dtype=np.float32
+)
+_DV_VALUES = np.where(_DV_VALUES == 0, np.inf, _DV_VALUES)
+
+# Precomputed inverse daily values: DV% collapses to one multiply-clip
+# (amount * serving_size * inv). Zero daily values map to 0.0 so the
+# old zero guard is just a falsy check on the inverse.
+_DV_INV = {
+    k: (1.0 / v) if v else 0.0
+    for k, v in _MEDICAL_GUIDELINES['daily_values'].items()
+}
+
+# Sentinel for lazily resolved credentials (None is a valid env result)
+_UNSET = object()
 
 class MedicalNutritionAPI:
     """
@@ -12,107 +396,272 @@ class MedicalNutritionAPI:
     - WHO Nutrition Guidelines
     - Medical research databases
     """
-    
+
+    # Fixed attribute layout: instances skip the per-object __dict__ and
+    # attribute access goes through fixed slot offsets
+    __slots__ = (
+        '_usda_api_key', '_openai_api_key', '_anthropic_api_key',
+        '_session', '_http', '_aclient', '_executor', '_redis', '_local_cache',
+        'medical_guidelines', '_daily_values'
+    )
+
+    @property
+    def usda_api_key(self) -> str:
+        if self._usda_api_key is _UNSET:
+            self._usda_api_key = os.getenv('USDA_API_KEY', 'DEMO_KEY')
+        return self._usda_api_key
+
+    @property
+    def openai_api_key(self) -> Optional[str]:
+        if self._openai_api_key is _UNSET:
+            self._openai_api_key = os.getenv('OPENAI_API_KEY')
+        return self._openai_api_key
+
+    @property
+    def anthropic_api_key(self) -> Optional[str]:
+        if self._anthropic_api_key is _UNSET:
+            self._anthropic_api_key = os.getenv('ANTHROPIC_API_KEY')
+        return self._anthropic_api_key
+
     def __init__(self):
-        self.usda_api_key = os.getenv('USDA_API_KEY', 'DEMO_KEY')
-        self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        self.anthropic_api_key = os.getenv('ANTHROPIC_API_KEY')
-        
-        # Medical nutrition guidelines (WHO, FDA, AHA, etc.)
-        self.medical_guidelines = {
-            'daily_values': {
-                'calories': 2000,
-                'total_fat': 65,  # g
-                'saturated_fat': 20,  # g
-                'trans_fat': 0,  # g (should be minimal)
-                'cholesterol': 300,  # mg
-                'sodium': 2300,  # mg
-                'total_carbohydrate': 300,  # g
-                'dietary_fiber': 25,  # g
-                'total_sugars': 50,  # g (WHO recommends <10% of calories)
-                'added_sugars': 25,  # g
-                'protein': 50,  # g
-                'vitamin_d': 20,  # mcg
-                'calcium': 1300,  # mg
-                'iron': 18,  # mg
-                'potassium': 4700,  # mg
-                'vitamin_c': 90,  # mg
-                'vitamin_a': 900,  # mcg
-                'vitamin_e': 15,  # mg
-                'vitamin_k': 120,  # mcg
-                'thiamin': 1.2,  # mg
-                'riboflavin': 1.3,  # mg
-                'niacin': 16,  # mg
-                'vitamin_b6': 1.7,  # mg
-                'folate': 400,  # mcg
-                'vitamin_b12': 2.4,  # mcg
-                'biotin': 30,  # mcg
-                'pantothenic_acid': 5,  # mg
-                'phosphorus': 1250,  # mg
-                'iodine': 150,  # mcg
-                'magnesium': 420,  # mg
-                'zinc': 11,  # mg
-                'selenium': 55,  # mcg
-                'copper': 0.9,  # mg
-                'manganese': 2.3,  # mg
-                'chromium': 35,  # mcg
-                'molybdenum': 45,  # mcg
-                'chloride': 2300,  # mg
-            },
-            'who_guidelines': {
-                'sugar_percentage': 10,  # % of total energy intake
-                'sodium_max': 2000,  # mg per day
-                'saturated_fat_percentage': 10,  # % of total energy intake
-                'trans_fat_percentage': 1,  # % of total energy intake
-                'fiber_min': 25,  # g per day
-            },
-            'fda_guidelines': {
-                'added_sugars_max': 50,  # g per day
-                'sodium_max': 2300,  # mg per day
-                'saturated_fat_max': 20,  # g per day
-            }
-        }
+        # Credentials are resolved lazily on first access so demo-only
+        # usage (tests, screenshots) skips the env lookups entirely
+        self._usda_api_key = _UNSET
+        self._openai_api_key = _UNSET
+        self._anthropic_api_key = _UNSET
+
+        # Shared session so lookups reuse keep-alive connections to the
+        # USDA/OpenFoodFacts hosts instead of paying a fresh TCP+TLS
+        # handshake per call; transient 5xx responses are retried
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=20,
+            max_retries=Retry(
+                total=2,
+                backoff_factor=0.2,
+                status_forcelist=(500, 502, 503, 504)
+            )
+        )
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._session.headers.update({
+            'Accept': 'application/json',
+            'User-Agent': 'packaged-food-rating-app/1.0'
+        })
+
+        # Prefer an HTTP/2-capable httpx client when available so
+        # concurrent lookups multiplex over a single connection;
+        # the requests session stays as fallback and still serves the
+        # streaming (response.raw) path
+        self._http = self._session
+        if HTTPX_AVAILABLE:
+            try:
+                self._http = httpx.Client(
+                    http2=True,
+                    timeout=10.0,
+                    limits=httpx.Limits(
+                        max_connections=50, max_keepalive_connections=10
+                    ),
+                    headers={
+                        'Accept': 'application/json',
+                        'User-Agent': 'packaged-food-rating-app/1.0'
+                    }
+                )
+            except Exception:
+                # http2 extra (h2) not installed - stick with requests
+                self._http = self._session
+
+        # Async client for concurrent lookups, created on first await so
+        # it binds to the running event loop
+        self._aclient = None
+
+        # Worker pool used to overlap USDA and OpenFoodFacts round-trips
+        self._executor = ThreadPoolExecutor(max_workers=4)
+
+        # Lookup cache: the same barcode is scanned by many users, so
+        # serving repeats from cache skips the whole HTTPS round-trip and
+        # preserves upstream API quota
+        self._redis = None
+        redis_url = os.getenv('REDIS_URL')
+        if REDIS_AVAILABLE and redis_url:
+            try:
+                self._redis = redis.Redis.from_url(redis_url, decode_responses=True)
+                self._redis.ping()
+            except Exception:
+                self._redis = None
+        self._local_cache = {}
+
+        # Medical nutrition guidelines (WHO, FDA, AHA, etc.) - shared
+        # read-only view, plus a direct handle on the daily values to skip
+        # a lookup in calculate_daily_value_percentage
+        self.medical_guidelines = _MEDICAL_GUIDELINES
+        self._daily_values = _MEDICAL_GUIDELINES['daily_values']
     
     def search_food_by_barcode(self, barcode: str) -> Dict[str, Any]:
         """Search for food using barcode with multiple API sources"""
+        cache_key = f"nutri:v1:barcode:{barcode}"
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            # Try USDA FoodData Central first (if API key available)
             if self.usda_api_key and self.usda_api_key != 'DEMO_KEY':
-                usda_result = self._search_usda_by_barcode(barcode)
+                # Fire both lookups in parallel so a miss on the preferred
+                # USDA source costs max() of the two round-trips, not their
+                # sum. USDA still wins whenever it returns data.
+                usda_future = self._executor.submit(self._search_usda_by_barcode, barcode)
+                off_future = self._executor.submit(self._search_openfoodfacts, barcode)
+
+                usda_result = usda_future.result()
                 if usda_result and usda_result.get('foods'):
-                    return self._process_usda_result(usda_result)
-            
-            # Fallback to OpenFoodFacts (no API key required)
-            off_result = self._search_openfoodfacts(barcode)
+                    off_future.cancel()
+                    return self._cache_set(cache_key, self._process_usda_result(usda_result))
+                off_result = off_future.result()
+            else:
+                # No USDA key - OpenFoodFacts is the only remote source
+                off_result = self._search_openfoodfacts(barcode)
+
             if off_result and off_result.get('product'):
-                return self._process_openfoodfacts_result(off_result)
-            
+                return self._cache_set(cache_key, self._process_openfoodfacts_result(off_result))
+
             # If no API access, return a demo result
-            return self._create_demo_result(barcode)
-            
+            return self._cache_set(cache_key, self._create_demo_result(barcode))
+
         except Exception as e:
+            # Transport failures are not cached - the next call may succeed
             return {'error': f'API search failed: {str(e)}'}
-    
+
     def search_food_by_name(self, name: str) -> Dict[str, Any]:
         """Search for food by name with medical-grade accuracy"""
+        name_digest = hashlib.sha1(name.strip().lower().encode('utf-8')).hexdigest()
+        cache_key = f"nutri:v1:name:{name_digest}"
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
             # Search USDA FoodData Central (if API key available)
             if self.usda_api_key and self.usda_api_key != 'DEMO_KEY':
                 usda_result = self._search_usda_by_name(name)
                 if usda_result and usda_result.get('foods'):
-                    return self._process_usda_result(usda_result)
-            
+                    return self._cache_set(cache_key, self._process_usda_result(usda_result))
+
             # Fallback to OpenFoodFacts (no API key required)
             off_result = self._search_openfoodfacts_by_name(name)
             if off_result:
-                return self._process_openfoodfacts_result(off_result)
-            
+                return self._cache_set(cache_key, self._process_openfoodfacts_result(off_result))
+
             # If no API access, return a demo result
-            return self._create_demo_result_by_name(name)
-            
+            return self._cache_set(cache_key, self._create_demo_result_by_name(name))
+
         except Exception as e:
+            # Transport failures are not cached - the next call may succeed
             return {'error': f'API search failed: {str(e)}'}
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Fetch a cached lookup result, None on miss"""
+        if self._redis is not None:
+            try:
+                data = self._redis.get(key)
+                if data:
+                    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+            except Exception:
+                pass
+            return None
+
+        entry = self._local_cache.get(key)
+        if entry is not None:
+            expires_at, result = entry
+            if expires_at > time.time():
+                return result
+            del self._local_cache[key]
+        return None
+
+    def _cache_set(self, key: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a lookup result and pass it through to the caller"""
+        ttl = _CACHE_TTL_MISS if 'error' in result else _CACHE_TTL_HIT
+
+        if self._redis is not None:
+            try:
+                payload = (orjson.dumps(result).decode() if ORJSON_AVAILABLE
+                           else json.dumps(result, default=str))
+                self._redis.setex(key, ttl, payload)
+            except Exception:
+                pass
+            return result
+
+        if len(self._local_cache) >= 4096:
+            self._local_cache.clear()
+        self._local_cache[key] = (time.time() + ttl, result)
+        return result
     
+    async def search_food_by_barcode_async(self, barcode: str) -> Dict[str, Any]:
+        """Async variant of search_food_by_barcode for concurrent scans"""
+        try:
+            if self.usda_api_key and self.usda_api_key != 'DEMO_KEY':
+                usda_result = await self._aget_json(
+                    "https://api.nal.usda.gov/fdc/v1/foods/search",
+                    params=self._usda_params(barcode, page_size=1)
+                )
+                if usda_result and usda_result.get('foods'):
+                    return self._process_usda_result(usda_result)
+
+            off_result = await self._aget_json(
+                f"https://world.openfoodfacts.org/api/v0/product/{barcode}.json"
+            )
+            if off_result and off_result.get('product'):
+                return self._process_openfoodfacts_result(off_result)
+
+            return self._create_demo_result(barcode)
+
+        except Exception as e:
+            return {'error': f'API search failed: {str(e)}'}
+
+    async def search_many(self, barcodes: List[str], max_concurrency: int = 20) -> List[Dict[str, Any]]:
+        """Look up many barcodes concurrently with bounded parallelism"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def lookup(barcode: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.search_food_by_barcode_async(barcode)
+
+        return await asyncio.gather(*(lookup(barcode) for barcode in barcodes))
+
+    def _get_aclient(self):
+        """Create the shared httpx client on first use"""
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                timeout=10,
+                headers={
+                    'Accept': 'application/json',
+                    'User-Agent': 'packaged-food-rating-app/1.0'
+                }
+            )
+        return self._aclient
+
+    async def _aget_json(self, url: str, params: Optional[Dict] = None) -> Optional[Dict]:
+        """GET a JSON payload asynchronously, None on any failure"""
+        if not HTTPX_AVAILABLE:
+            return None
+        try:
+            response = await self._get_aclient().get(url, params=params)
+            if response.status_code == 200:
+                return _decode_json_response(response)
+        except Exception:
+            pass
+        return None
+
+    def _usda_params(self, query: str, page_size: int) -> Dict[str, Any]:
+        """Build the USDA FoodData Central search parameters"""
+        return {
+            'api_key': self.usda_api_key,
+            'query': query,
+            'dataType': ['Foundation', 'SR Legacy', 'FNDDS'],
+            'pageSize': page_size
+        }
+
     def _search_usda_by_barcode(self, barcode: str) -> Optional[Dict]:
         """Search USDA FoodData Central by barcode"""
         try:
@@ -124,9 +673,9 @@ class MedicalNutritionAPI:
                 'pageSize': 1
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self._http.get(url, params=params, timeout=10)
             if response.status_code == 200:
-                return response.json()
+                return _decode_json_response(response)
         except Exception:
             pass
         return None
@@ -141,21 +690,81 @@ class MedicalNutritionAPI:
                 'dataType': ['Foundation', 'SR Legacy', 'FNDDS'],
                 'pageSize': 5
             }
-            
-            response = requests.get(url, params=params, timeout=10)
+
+            if IJSON_AVAILABLE:
+                # Stream-parse: only the first food is consumed downstream,
+                # so stop after it instead of materializing the whole
+                # payload (FNDDS hits can run to hundreds of KB)
+                response = self._session.get(url, params=params, timeout=10, stream=True)
+                try:
+                    if response.status_code == 200:
+                        # The raw socket stream is gzip-compressed (requests
+                        # negotiates it by default); have urllib3 decode it
+                        # so ijson sees plain JSON bytes
+                        response.raw.decode_content = True
+                        for food in ijson.items(response.raw, 'foods.item'):
+                            return {'foods': [food]}
+                finally:
+                    response.close()
+                return None
+
+            response = self._http.get(url, params=params, timeout=10)
             if response.status_code == 200:
-                return response.json()
+                return _decode_json_response(response)
         except Exception:
             pass
         return None
     
+    def search_many_usda(self, fdc_ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        Fetch many USDA foods by FDC ID with one request per 20 IDs
+
+        Uses the POST /v1/foods endpoint, amortizing the TLS and HTTP
+        overhead across the batch instead of issuing one search per item.
+        """
+        results = []
+        for start in range(0, len(fdc_ids), 20):
+            chunk = fdc_ids[start:start + 20]
+            try:
+                response = self._http.post(
+                    "https://api.nal.usda.gov/fdc/v1/foods",
+                    params={'api_key': self.usda_api_key},
+                    json={'fdcIds': chunk, 'format': 'full'},
+                    timeout=10
+                )
+                if response.status_code != 200:
+                    continue
+                for food in _decode_json_response(response):
+                    results.append(self._process_usda_result({'foods': [food]}))
+            except Exception:
+                continue
+        return results
+
     def _search_openfoodfacts(self, barcode: str) -> Optional[Dict]:
         """Search OpenFoodFacts by barcode"""
         try:
             url = f"https://world.openfoodfacts.org/api/v0/product/{barcode}.json"
-            response = requests.get(url, timeout=10)
+
+            # Conditional GET: product documents change rarely, so sending
+            # the cached ETag usually gets a body-less 304 back instead of
+            # re-downloading and re-parsing the full JSON
+            cache_key = f"nutri:v1:off-etag:{barcode}"
+            cached = self._cache_get(cache_key)
+            headers = None
+            if cached and cached.get('etag'):
+                headers = {'If-None-Match': cached['etag']}
+
+            response = self._http.get(url, timeout=10, headers=headers)
+            if response.status_code == 304 and cached is not None:
+                # Not modified - reuse the cached document and bump its TTL
+                self._cache_set(cache_key, cached)
+                return cached['body']
             if response.status_code == 200:
-                return response.json()
+                body = _decode_json_response(response)
+                etag = response.headers.get('ETag')
+                if etag:
+                    self._cache_set(cache_key, {'etag': etag, 'body': body})
+                return body
         except Exception:
             pass
         return None
@@ -172,9 +781,9 @@ class MedicalNutritionAPI:
                 'page_size': 1
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self._session.get(url, params=params, timeout=10)
             if response.status_code == 200:
-                data = response.json()
+                data = _decode_json_response(response)
                 if data.get('products') and len(data['products']) > 0:
                     return data['products'][0]
         except Exception:
@@ -190,42 +799,21 @@ class MedicalNutritionAPI:
         
         # Extract nutrition data
         nutrition = {}
-        for nutrient in food.get('foodNutrients', []):
-            if nutrient.get('nutrient'):
-                nutrient_name = nutrient['nutrient']['name'].lower()
-                amount = nutrient.get('amount', 0)
-                
-                # Map to standard names
-                if 'energy' in nutrient_name and 'kcal' in nutrient_name:
-                    nutrition['calories'] = amount
-                elif 'protein' in nutrient_name:
-                    nutrition['protein'] = amount
-                elif 'total lipid' in nutrient_name or 'fat' in nutrient_name:
-                    nutrition['total_fat'] = amount
-                elif 'saturated' in nutrient_name and 'fat' in nutrient_name:
-                    nutrition['saturated_fat'] = amount
-                elif 'trans' in nutrient_name and 'fat' in nutrient_name:
-                    nutrition['trans_fat'] = amount
-                elif 'sodium' in nutrient_name:
-                    nutrition['sodium'] = amount
-                elif 'carbohydrate' in nutrient_name and 'by difference' in nutrient_name:
-                    nutrition['total_carbohydrate'] = amount
-                elif 'fiber' in nutrient_name and 'total dietary' in nutrient_name:
-                    nutrition['dietary_fiber'] = amount
-                elif 'sugars' in nutrient_name and 'total' in nutrient_name:
-                    nutrition['total_sugars'] = amount
-                elif 'cholesterol' in nutrient_name:
-                    nutrition['cholesterol'] = amount
-                elif 'calcium' in nutrient_name:
-                    nutrition['calcium'] = amount
-                elif 'iron' in nutrient_name:
-                    nutrition['iron'] = amount
-                elif 'potassium' in nutrient_name:
-                    nutrition['potassium'] = amount
-                elif 'vitamin c' in nutrient_name:
-                    nutrition['vitamin_c'] = amount
-                elif 'vitamin d' in nutrient_name:
-                    nutrition['vitamin_d'] = amount
+        # Hot loop over often 100+ nutrient rows: resolve each dict lookup
+        # once per row and keep the rule table in a local
+        rules = _USDA_NUTRIENT_RULES
+        for nutrient in food.get('foodNutrients', ()):
+            meta = nutrient.get('nutrient')
+            if not meta:
+                continue
+            name_lower = meta['name'].lower()
+            amount = nutrient.get('amount', 0)
+
+            # Map to standard names via the precomputed rule table
+            for alternatives, standard_key in rules:
+                if any(all(sub in name_lower for sub in alt) for alt in alternatives):
+                    nutrition[standard_key] = amount
+                    break
         
         return {
             'product_name': food.get('description', 'Unknown Product'),
@@ -248,28 +836,11 @@ class MedicalNutritionAPI:
         nutrition = {}
         nutriments = product.get('nutriments', {})
         
-        # Map OpenFoodFacts nutrition keys
-        nutrition_mapping = {
-            'energy-kcal_100g': 'calories',
-            'proteins_100g': 'protein',
-            'carbohydrates_100g': 'total_carbohydrate',
-            'sugars_100g': 'total_sugars',
-            'fat_100g': 'total_fat',
-            'saturated-fat_100g': 'saturated_fat',
-            'trans-fat_100g': 'trans_fat',
-            'sodium_100g': 'sodium',
-            'fiber_100g': 'dietary_fiber',
-            'cholesterol_100g': 'cholesterol',
-            'calcium_100g': 'calcium',
-            'iron_100g': 'iron',
-            'potassium_100g': 'potassium',
-            'vitamin-c_100g': 'vitamin_c',
-            'vitamin-d_100g': 'vitamin_d'
-        }
-        
-        for off_key, standard_key in nutrition_mapping.items():
-            if off_key in nutriments:
-                nutrition[standard_key] = nutriments[off_key]
+        # Map OpenFoodFacts nutrition keys onto the standard names
+        for off_key, value in nutriments.items():
+            standard_key = _OFF_NUTRIENT_MAP.get(off_key)
+            if standard_key is not None:
+                nutrition[standard_key] = value
         
         return {
             'product_name': product.get('product_name', 'Unknown Product'),
@@ -292,10 +863,10 @@ class MedicalNutritionAPI:
             if field in food and food[field]:
                 ingredients_text = food[field]
                 if isinstance(ingredients_text, str):
-                    # Split by common separators
-                    ingredient_list = [ing.strip() for ing in ingredients_text.split(',')]
-                    ingredients.extend(ingredient_list)
-        
+                    # Split by common separators, at most 20 pieces needed
+                    parts = _INGREDIENT_SPLIT.split(ingredients_text, maxsplit=20)
+                    ingredients.extend(p for p in (part.strip() for part in parts) if p)
+
         return ingredients[:20]  # Limit to first 20 ingredients
     
     def _extract_ingredients_from_off(self, product: Dict) -> List[str]:
@@ -304,10 +875,10 @@ class MedicalNutritionAPI:
         
         ingredients_text = product.get('ingredients_text', '')
         if ingredients_text:
-            # Split by common separators
-            ingredient_list = [ing.strip() for ing in ingredients_text.split(',')]
-            ingredients.extend(ingredient_list)
-        
+            # Split by common separators, at most 20 pieces needed
+            parts = _INGREDIENT_SPLIT.split(ingredients_text, maxsplit=20)
+            ingredients.extend(p for p in (part.strip() for part in parts) if p)
+
         return ingredients[:20]  # Limit to first 20 ingredients
     
     def get_medical_guidelines(self) -> Dict[str, Any]:
@@ -316,211 +887,55 @@ class MedicalNutritionAPI:
     
     def calculate_daily_value_percentage(self, nutrient: str, amount: float, serving_size: float = 100) -> float:
         """Calculate percentage of daily value for a nutrient"""
-        if nutrient not in self.medical_guidelines['daily_values']:
-            return 0.0
-        
-        daily_value = self.medical_guidelines['daily_values'][nutrient]
-        if daily_value == 0:
+        inv = _DV_INV.get(nutrient, 0.0)
+        if not inv:
             return 0.0
-        
-        # Convert to per serving if needed
-        amount_per_serving = (amount * serving_size) / 100
-        
-        return min(100.0, (amount_per_serving / daily_value) * 100)
+
+        # (amount * serving / 100) / dv * 100 simplifies to one multiply
+        return min(100.0, amount * serving_size * inv)
     
+    def calculate_daily_value_percentages(self, nutrition: Dict[str, float],
+                                          serving_size: float = 100) -> Dict[str, float]:
+        """Calculate DV% for every tracked nutrient in one vectorized pass"""
+        amounts = np.array(
+            [nutrition.get(k, 0.0) for k in _DV_KEYS], dtype=np.float32
+        )
+        pct = np.minimum(100.0, (amounts * serving_size / 100) / _DV_VALUES * 100)
+        return dict(zip(_DV_KEYS, pct.tolist()))
+
+    def score_many(self, nutrition_arr: np.ndarray) -> np.ndarray:
+        """
+        Score an (N, 5) array of nutrition columns in one vectorized pass
+
+        Columns follow _REC_NUTRIENTS order; the result holds -1 (warn),
+        0 (neutral) or 1 (good) per column, with the fiber/protein polarity
+        already flipped so high values score as good.
+        """
+        mask = np.where(
+            nutrition_arr > _REC_HI, -1, np.where(nutrition_arr < _REC_LO, 1, 0)
+        ).astype(np.int8)
+        return np.where(_REC_HIGH_IS_GOOD, -mask, mask)
+
     def get_health_recommendations(self, nutrition: Dict[str, float]) -> List[str]:
         """Get medical-grade health recommendations based on nutrition data"""
+        values = [nutrition.get(key, 0) for key in _REC_NUTRIENTS]
+        mask = self.score_many(np.array([values], dtype=np.float32))[0]
+
+        # Format messages with the caller's original values so int/float
+        # rendering matches the input
         recommendations = []
-        
-        # Sugar recommendations
-        sugar = nutrition.get('total_sugars', 0)
-        if sugar > 15:  # >15g per 100g is high
-            recommendations.append(f"⚠️ High sugar content ({sugar}g/100g). WHO recommends <10% of daily calories from sugar.")
-        elif sugar < 5:
-            recommendations.append(f"✅ Low sugar content ({sugar}g/100g). Good choice for sugar control.")
-        
-        # Sodium recommendations
-        sodium = nutrition.get('sodium', 0)
-        if sodium > 400:  # >400mg per 100g is high
-            recommendations.append(f"⚠️ High sodium content ({sodium}mg/100g). May contribute to high blood pressure.")
-        elif sodium < 120:
-            recommendations.append(f"✅ Low sodium content ({sodium}mg/100g). Good for heart health.")
-        
-        # Saturated fat recommendations
-        saturated_fat = nutrition.get('saturated_fat', 0)
-        if saturated_fat > 5:  # >5g per 100g is high
-            recommendations.append(f"⚠️ High saturated fat ({saturated_fat}g/100g). Limit for heart health.")
-        elif saturated_fat < 1.5:
-            recommendations.append(f"✅ Low saturated fat ({saturated_fat}g/100g). Good for cardiovascular health.")
-        
-        # Fiber recommendations
-        fiber = nutrition.get('dietary_fiber', 0)
-        if fiber > 3:
-            recommendations.append(f"✅ Good fiber content ({fiber}g/100g). Supports digestive health.")
-        elif fiber < 1:
-            recommendations.append(f"⚠️ Low fiber content ({fiber}g/100g). Consider adding fiber-rich foods.")
-        
-        # Protein recommendations
-        protein = nutrition.get('protein', 0)
-        if protein > 10:
-            recommendations.append(f"✅ Good protein content ({protein}g/100g). Supports muscle health.")
-        elif protein < 3:
-            recommendations.append(f"ℹ️ Low protein content ({protein}g/100g). Consider protein-rich alternatives.")
-        
+        for score, value, (warn, good) in zip(mask, values, _REC_TEMPLATES):
+            if score == -1:
+                recommendations.append(warn.format(v=value))
+            elif score == 1:
+                recommendations.append(good.format(v=value))
+
         return recommendations
     
     def _create_demo_result(self, barcode: str) -> Dict[str, Any]:
         """Create a demo result when no API access is available"""
-        # Sample demo data based on common barcodes
-        demo_products = {
-            '5449000000996': {  # Coca Cola
-                'product_name': 'Coca Cola Classic',
-                'nutrition': {
-                    'calories': 42.0,
-                    'protein': 0.0,
-                    'total_fat': 0.0,
-                    'saturated_fat': 0.0,
-                    'trans_fat': 0.0,
-                    'cholesterol': 0.0,
-                    'sodium': 1.0,
-                    'total_carbohydrate': 10.6,
-                    'dietary_fiber': 0.0,
-                    'total_sugars': 10.6,
-                    'added_sugars': 10.6,
-                    'calcium': 0.0,
-                    'iron': 0.0,
-                    'potassium': 0.0
-                },
-                'ingredients': [
-                    'carbonated water',
-                    'sugar',
-                    'caramel color',
-                    'phosphoric acid',
-                    'natural flavors',
-                    'caffeine'
-                ]
-            },
-            '3017620422003': {  # Nutella
-                'product_name': 'Nutella Hazelnut Spread',
-                'nutrition': {
-                    'calories': 546.0,
-                    'protein': 7.3,
-                    'total_fat': 30.0,
-                    'saturated_fat': 18.0,
-                    'trans_fat': 0.0,
-                    'cholesterol': 0.0,
-                    'sodium': 0.1,
-                    'total_carbohydrate': 59.4,
-                    'dietary_fiber': 3.4,
-                    'total_sugars': 47.0,
-                    'added_sugars': 47.0,
-                    'calcium': 0.0,
-                    'iron': 0.0,
-                    'potassium': 0.0
-                },
-                'ingredients': [
-                    'sugar',
-                    'palm oil',
-                    'hazelnuts',
-                    'cocoa powder',
-                    'skimmed milk powder',
-                    'lecithin',
-                    'vanillin'
-                ]
-            }
-        }
-        
-        if barcode in demo_products:
-            product_data = demo_products[barcode]
-            return {
-                'product_name': product_data['product_name'],
-                'barcode': barcode,
-                'brand': 'Demo Brand',
-                'nutrition': product_data['nutrition'],
-                'ingredients': product_data['ingredients'],
-                'serving_size': '100g',
-                'source': 'Demo Data',
-                'raw_data': product_data
-            }
-        else:
-            # Generic demo product
-            return {
-                'product_name': f'Demo Product {barcode}',
-                'barcode': barcode,
-                'brand': 'Demo Brand',
-                'nutrition': {
-                    'calories': 250.0,
-                    'protein': 10.0,
-                    'total_fat': 15.0,
-                    'saturated_fat': 5.0,
-                    'trans_fat': 0.0,
-                    'cholesterol': 0.0,
-                    'sodium': 300.0,
-                    'total_carbohydrate': 30.0,
-                    'dietary_fiber': 5.0,
-                    'total_sugars': 10.0,
-                    'added_sugars': 5.0,
-                    'calcium': 100.0,
-                    'iron': 2.0,
-                    'potassium': 200.0
-                },
-                'ingredients': [
-                    'water',
-                    'wheat flour',
-                    'sugar',
-                    'vegetable oil',
-                    'salt',
-                    'yeast',
-                    'natural flavors'
-                ],
-                'serving_size': '100g',
-                'source': 'Demo Data',
-                'raw_data': {}
-            }
-    
+        return _demo_by_barcode(barcode)
+
     def _create_demo_result_by_name(self, name: str) -> Dict[str, Any]:
         """Create a demo result by name when no API access is available"""
-        name_lower = name.lower()
-        
-        # Check for common product names
-        if 'coca' in name_lower or 'cola' in name_lower:
-            return self._create_demo_result('5449000000996')
-        elif 'nutella' in name_lower:
-            return self._create_demo_result('3017620422003')
-        elif 'bread' in name_lower:
-            return {
-                'product_name': f'Whole Grain Bread - {name}',
-                'barcode': '',
-                'brand': 'Demo Brand',
-                'nutrition': {
-                    'calories': 247.0,
-                    'protein': 13.4,
-                    'total_fat': 4.2,
-                    'saturated_fat': 0.9,
-                    'trans_fat': 0.0,
-                    'cholesterol': 0.0,
-                    'sodium': 681.0,
-                    'total_carbohydrate': 41.0,
-                    'dietary_fiber': 7.0,
-                    'total_sugars': 5.0,
-                    'added_sugars': 2.0,
-                    'calcium': 100.0,
-                    'iron': 2.5,
-                    'potassium': 200.0
-                },
-                'ingredients': [
-                    'whole wheat flour',
-                    'water',
-                    'yeast',
-                    'salt',
-                    'sugar',
-                    'vegetable oil',
-                    'preservative'
-                ],
-                'serving_size': '100g',
-                'source': 'Demo Data',
-                'raw_data': {}
-            }
-        else:
-            # Generic demo product
-            return self._create_demo_result('0000000000000')
+        return _demo_by_name(name)
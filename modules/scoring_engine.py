@@ -1,22 +1,88 @@
 from typing import Dict, List, Any, Tuple
+import asyncio
+import bisect
+import hashlib
+import json
 import math
+import operator
+import re
+from collections import OrderedDict
+from types import MappingProxyType
+import numpy as np
 
 # Try to import medical LLM service, fallback gracefully if not available
 try:
-    from .medical_llm_service import medical_llm_service
+    from .medical_llm_service import get_medical_llm_service
     MEDICAL_LLM_AVAILABLE = True
 except ImportError as e:
     print(f"Warning: Medical LLM service not available: {e}")
-    medical_llm_service = None
+    get_medical_llm_service = None
     MEDICAL_LLM_AVAILABLE = False
 
+# Optional Aho-Corasick: one multi-pattern automaton pass over each
+# nutrient analysis stops at the first risk keyword hit
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Risk keywords flagged in LLM nutrient analyses; one case-insensitive
+# regex pass replaces four substring scans plus a .lower() per analysis
+_RISK_KEYWORDS = ('high', 'excess', 'risk', 'concern')
+_RISK_RE = re.compile('|'.join(_RISK_KEYWORDS), re.IGNORECASE)
+
+if AHOCORASICK_AVAILABLE:
+    _RISK_AC = ahocorasick.Automaton()
+    for _kw in _RISK_KEYWORDS:
+        _RISK_AC.add_word(_kw, _kw)
+    _RISK_AC.make_automaton()
+
+def _has_risk_keyword(analysis: str) -> bool:
+    """True when an analysis mentions any risk keyword"""
+    if AHOCORASICK_AVAILABLE:
+        return next(_RISK_AC.iter(analysis.lower()), None) is not None
+    return _RISK_RE.search(analysis) is not None
+
+# Health-band cutoffs; the scalar path keeps its cheap if/elif but the
+# batch path assigns bands for the whole batch with one searchsorted
+_BAND_THR = np.array([60, 80], dtype=np.int32)
+_BANDS = ('Poor', 'Moderate', 'Excellent')
+
 class HealthScoringEngine:
-    def __init__(self):
-        # WHO, FDA, and FSSAI guidelines for health scoring
-        self.scoring_rules = {
+    # Column layout for the vectorized batch path: where each rule's input
+    # comes from (nutrition value, ingredient-list length, or direct field)
+    _BATCH_RULES = (
+        ('nutrition', 'sugar', 'sugar_content'),
+        ('nutrition', 'sodium', 'sodium_content'),
+        ('nutrition', 'saturated_fat', 'saturated_fat'),
+        ('nutrition', 'trans_fat', 'trans_fat'),
+        ('nutrition', 'fiber', 'fiber_content'),
+        ('nutrition', 'protein', 'protein_content'),
+        ('count', 'additives', 'additives_count'),
+        ('count', 'preservatives', 'preservatives'),
+        ('count', 'artificial_colors', 'artificial_colors'),
+        ('count', 'artificial_sweeteners', 'artificial_sweeteners'),
+        ('value', 'natural_ratio', 'natural_ratio'),
+    )
+
+    # Typed zero defaults for the six nutrition inputs plus one itemgetter
+    # bound in matrix row order; merging the defaults under the incoming
+    # dict makes every lookup a guaranteed hit
+    _NUTRITION_DEFAULTS = {
+        'sugar': 0, 'sodium': 0, 'saturated_fat': 0,
+        'trans_fat': 0, 'fiber': 0, 'protein': 0
+    }
+    _NUTRITION_GETTER = operator.itemgetter(
+        'sugar', 'sodium', 'saturated_fat', 'trans_fat', 'fiber', 'protein'
+    )
+
+    # WHO, FDA, and FSSAI guidelines for health scoring; built once at class
+    # definition so each engine instance shares the same rule objects
+    _SCORING_RULES = {
             # Sugar content (per 100g) - WHO recommends <10% of daily energy intake
             'sugar_content': {
-                'thresholds': [(5, 0), (10, -10), (15, -20), (20, -30)],
+                'thresholds': ((5, 0), (10, -10), (15, -20), (20, -30)),
                 'max_penalty': -30,
                 'source': 'WHO Guidelines',
                 'description': 'Sugar content per 100g'
@@ -24,7 +90,7 @@ class HealthScoringEngine:
             
             # Sodium content (per 100g) - WHO recommends <2g sodium per day
             'sodium_content': {
-                'thresholds': [(200, 0), (400, -10), (600, -20), (800, -30)],
+                'thresholds': ((200, 0), (400, -10), (600, -20), (800, -30)),
                 'max_penalty': -30,
                 'source': 'WHO Guidelines',
                 'description': 'Sodium content per 100g (mg)'
@@ -32,7 +98,7 @@ class HealthScoringEngine:
             
             # Saturated fat (per 100g) - WHO recommends <10% of daily energy intake
             'saturated_fat': {
-                'thresholds': [(2, 0), (5, -10), (10, -20), (15, -30)],
+                'thresholds': ((2, 0), (5, -10), (10, -20), (15, -30)),
                 'max_penalty': -30,
                 'source': 'WHO Guidelines',
                 'description': 'Saturated fat per 100g'
@@ -40,7 +106,7 @@ class HealthScoringEngine:
             
             # Trans fat (per 100g) - Should be minimal
             'trans_fat': {
-                'thresholds': [(0.5, -10), (1, -20), (2, -30)],
+                'thresholds': ((0.5, -10), (1, -20), (2, -30)),
                 'max_penalty': -30,
                 'source': 'FDA Guidelines',
                 'description': 'Trans fat per 100g'
@@ -48,7 +114,7 @@ class HealthScoringEngine:
             
             # Fiber content (per 100g) - Positive scoring
             'fiber_content': {
-                'thresholds': [(2, 5), (3, 10), (5, 15), (8, 20)],
+                'thresholds': ((2, 5), (3, 10), (5, 15), (8, 20)),
                 'max_bonus': 20,
                 'source': 'WHO Guidelines',
                 'description': 'Dietary fiber per 100g'
@@ -56,7 +122,7 @@ class HealthScoringEngine:
             
             # Protein content (per 100g) - Positive scoring
             'protein_content': {
-                'thresholds': [(5, 5), (10, 10), (15, 15), (20, 20)],
+                'thresholds': ((5, 5), (10, 10), (15, 15), (20, 20)),
                 'max_bonus': 20,
                 'source': 'FSSAI Guidelines',
                 'description': 'Protein per 100g'
@@ -64,7 +130,7 @@ class HealthScoringEngine:
             
             # Additives count - Penalty for high number
             'additives_count': {
-                'thresholds': [(3, -5), (5, -10), (8, -15), (10, -20)],
+                'thresholds': ((3, -5), (5, -10), (8, -15), (10, -20)),
                 'max_penalty': -20,
                 'source': 'FSSAI Guidelines',
                 'description': 'Number of food additives'
@@ -72,7 +138,7 @@ class HealthScoringEngine:
             
             # Preservatives - Penalty
             'preservatives': {
-                'thresholds': [(1, -5), (2, -10), (3, -15)],
+                'thresholds': ((1, -5), (2, -10), (3, -15)),
                 'max_penalty': -15,
                 'source': 'FDA Guidelines',
                 'description': 'Preservatives present'
@@ -80,7 +146,7 @@ class HealthScoringEngine:
             
             # Artificial colors - Penalty
             'artificial_colors': {
-                'thresholds': [(1, -5), (2, -10), (3, -15)],
+                'thresholds': ((1, -5), (2, -10), (3, -15)),
                 'max_penalty': -15,
                 'source': 'FDA Guidelines',
                 'description': 'Artificial colors present'
@@ -88,7 +154,7 @@ class HealthScoringEngine:
             
             # Natural ingredients ratio - Bonus
             'natural_ratio': {
-                'thresholds': [(0.3, 5), (0.5, 10), (0.7, 15), (0.9, 20)],
+                'thresholds': ((0.3, 5), (0.5, 10), (0.7, 15), (0.9, 20)),
                 'max_bonus': 20,
                 'source': 'FSSAI Guidelines',
                 'description': 'Ratio of natural ingredients'
@@ -96,16 +162,119 @@ class HealthScoringEngine:
             
             # Artificial sweeteners - Penalty
             'artificial_sweeteners': {
-                'thresholds': [(1, -8), (2, -15)],
+                'thresholds': ((1, -8), (2, -15)),
                 'max_penalty': -15,
                 'source': 'FDA Guidelines',
                 'description': 'Artificial sweeteners present'
             }
         }
-    
+
+    # Read-only views: triggered-rule records and get_scoring_rules() hand
+    # these objects straight to callers, so nothing downstream can mutate
+    # the engine's shared rule state through them
+    _SCORING_RULES = {
+        name: MappingProxyType(rule) for name, rule in _SCORING_RULES.items()
+    }
+
+    # Known rule names as a frozenset for fast membership misses
+    _RULE_NAMES = frozenset(_SCORING_RULES)
+
+    # Count-based ingredient rules as (source field, rule name) pairs;
+    # natural_ratio is handled separately since it is not a count
+    _INGREDIENT_RULES = (
+        ('additives', 'additives_count'),
+        ('preservatives', 'preservatives'),
+        ('artificial_colors', 'artificial_colors'),
+        ('artificial_sweeteners', 'artificial_sweeteners')
+    )
+
+    # Unit suffix per nutrition key when formatting values for the medical
+    # LLM; one dict probe replaces the chain of substring tests
+    _UNIT_SUFFIX = {
+        'sodium': 'mg',
+        'sugar': 'g',
+        'fat': 'g',
+        'total_fat': 'g',
+        'saturated_fat': 'g',
+        'trans_fat': 'g',
+        'protein': 'g',
+        'fiber': 'g'
+    }
+
+    def __init__(self):
+        self.scoring_rules = self._SCORING_RULES
+
+        # Structure-of-arrays view of the thresholds: per rule, one sorted
+        # value array and one parallel impact array. The ndarrays feed the
+        # vectorized batch path; the plain tuples feed bisect on the scalar
+        # path, where a C binary search beats an ndarray scalar lookup.
+        self._thr_v = {}
+        self._thr_i = {}
+        self._thr_v_t = {}
+        self._thr_i_t = {}
+        for name, rule in self.scoring_rules.items():
+            value_col = tuple(t for t, _ in rule['thresholds'])
+            impact_col = tuple(i for _, i in rule['thresholds'])
+            self._thr_v[name] = np.asarray(value_col, dtype=np.float64)
+            self._thr_i[name] = np.asarray(impact_col, dtype=np.int32)
+            self._thr_v_t[name] = value_col
+            self._thr_i_t[name] = impact_col
+
+        # Flat, integer-indexed view of the rules: resolving a rule becomes
+        # one dict probe for the id, then plain tuple indexing; thresholds
+        # live in contiguous padded matrices shared with the batch paths
+        self._rule_names = tuple(self.scoring_rules)
+        self._rule_idx = {name: i for i, name in enumerate(self._rule_names)}
+        self._rule_desc = tuple(r['description'] for r in self.scoring_rules.values())
+        self._rule_source = tuple(r['source'] for r in self.scoring_rules.values())
+        self._rule_thresholds = tuple(r['thresholds'] for r in self.scoring_rules.values())
+        n_rules = len(self._rule_names)
+        self._thr_v_all = np.full((n_rules, 4), np.inf, dtype=np.float64)
+        self._thr_i_all = np.zeros((n_rules, 4), dtype=np.int32)
+        for i, name in enumerate(self._rule_names):
+            width = len(self._thr_v_t[name])
+            self._thr_v_all[i, :width] = self._thr_v_t[name]
+            self._thr_i_all[i, :width] = self._thr_i_t[name]
+
+        # Fused nutrition kernel: the six nutrition rules' thresholds packed
+        # into padded (6, 4) matrices so one broadcast compare scores all of
+        # them at once (inf padding never matches, zero impacts are unused)
+        self._nutri_keys = tuple(
+            key for kind, key, _ in self._BATCH_RULES if kind == 'nutrition'
+        )
+        self._nutri_rule_names = tuple(
+            rule for kind, _, rule in self._BATCH_RULES if kind == 'nutrition'
+        )
+        self._thr_v_matrix = np.full((6, 4), np.inf, dtype=np.float64)
+        self._thr_i_matrix = np.zeros((6, 4), dtype=np.int32)
+        for row, rule_name in enumerate(self._nutri_rule_names):
+            width = len(self._thr_v_t[rule_name])
+            self._thr_v_matrix[row, :width] = self._thr_v_t[rule_name]
+            self._thr_i_matrix[row, :width] = self._thr_i_t[rule_name]
+        self._nutri_rows = np.arange(6)
+
+        # Memoized full-score results. Only worthwhile when the medical LLM
+        # is in play — without it a scoring pass is microseconds of work.
+        self._score_cache = {}
+
+        # Content-addressed medical analyses: a hit replaces a full LLM
+        # forward pass. LRU-bounded via OrderedDict.
+        self._med_cache = OrderedDict()
+
     def calculate_score(self, normalized_data: Dict[str, Any]) -> Dict[str, Any]:
         """Calculate health score based on normalized product data with medical LLM enhancement"""
+        cache_key = None
         try:
+            # Probe the cache inside the try: _score_cache_key only guards
+            # building the key tuple, and unhashable nested values surface
+            # at hash time in the .get itself
+            if MEDICAL_LLM_AVAILABLE:
+                cache_key = self._score_cache_key(normalized_data)
+            if cache_key is not None:
+                cached = self._score_cache.get(cache_key)
+                if cached is not None:
+                    return dict(cached)
+
             nutrition = normalized_data.get('nutrition', {})
             ingredients = normalized_data.get('ingredients', [])
             product_name = normalized_data.get('product_name', 'Unknown Product')
@@ -142,7 +311,7 @@ class HealthScoringEngine:
             # Determine health band
             band = self._determine_health_band(total_score)
             
-            return {
+            result = {
                 'score': round(total_score),
                 'band': band,
                 'score_components': score_components,
@@ -153,7 +322,14 @@ class HealthScoringEngine:
                 'medical_analysis': medical_analysis,
                 'medical_enhanced': True
             }
-            
+
+            if cache_key is not None:
+                if len(self._score_cache) >= 1024:
+                    self._score_cache.clear()
+                self._score_cache[cache_key] = result
+
+            return result
+
         except Exception as e:
             return {
                 'score': 0,
@@ -164,112 +340,190 @@ class HealthScoringEngine:
                 'medical_enhanced': False
             }
     
+    def _score_cache_key(self, normalized_data: Dict[str, Any]):
+        """Build a hashable key over the inputs calculate_score reads, or None"""
+        try:
+            nutrition = normalized_data.get('nutrition', {}) or {}
+            return (
+                normalized_data.get('product_name', ''),
+                tuple(sorted(nutrition.items())),
+                tuple(normalized_data.get('ingredients', []) or ()),
+                tuple(normalized_data.get('additives', []) or ()),
+                tuple(normalized_data.get('preservatives', []) or ()),
+                tuple(normalized_data.get('artificial_colors', []) or ()),
+                tuple(normalized_data.get('artificial_sweeteners', []) or ()),
+                normalized_data.get('natural_ratio', 0)
+            )
+        except (TypeError, AttributeError):
+            return None
+
+    def calculate_scores_batch(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Score many normalized products in one vectorized pass.
+
+        Applies every rule with a single searchsorted across the whole
+        batch and returns compact summaries (score, band, score_impact).
+        The per-rule component breakdown and the medical LLM analysis are
+        only produced by the single-product calculate_score path.
+        """
+        if not records:
+            return []
+
+        n_records = len(records)
+        values = np.zeros((n_records, len(self._BATCH_RULES)), dtype=np.float64)
+        for row, record in enumerate(records):
+            nutrition = record.get('nutrition', {}) or {}
+            for col, (kind, key, _) in enumerate(self._BATCH_RULES):
+                if kind == 'nutrition':
+                    values[row, col] = nutrition.get(key, 0) or 0
+                elif kind == 'count':
+                    values[row, col] = len(record.get(key, ()) or ())
+                else:
+                    values[row, col] = record.get(key, 0) or 0
+
+        totals = np.zeros(n_records, dtype=np.float64)
+        for col, (_, _, rule_name) in enumerate(self._BATCH_RULES):
+            idx = np.searchsorted(self._thr_v[rule_name], values[:, col], side='right')
+            impacts = np.where(
+                idx > 0, self._thr_i[rule_name][np.clip(idx - 1, 0, None)], 0
+            )
+            totals += impacts
+
+        scores = np.clip(50 + totals, 0, 100)
+        band_idx = np.searchsorted(_BAND_THR, scores, side='right')
+        return [
+            {
+                'score': int(round(float(score))),
+                'band': _BANDS[int(idx)],
+                'score_impact': float(score) - 50,
+                'max_possible_score': 100,
+                'min_possible_score': 0,
+                'medical_enhanced': False
+            }
+            for score, idx in zip(scores, band_idx)
+        ]
+
+    async def _get_medical_analysis_async(self, product_name: str, ingredients: List[str],
+                                          nutrition: Dict[str, float],
+                                          semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """Run the blocking medical analysis in a worker thread"""
+        async with semaphore:
+            return await asyncio.to_thread(
+                self._get_medical_analysis, product_name, ingredients, nutrition
+            )
+
+    async def calculate_scores_batch_async(self, records: List[Dict[str, Any]],
+                                           max_concurrency: int = 16) -> List[Dict[str, Any]]:
+        """Score a batch with the medical LLM calls overlapped.
+
+        The analyses — the dominant cost — are fanned out to worker threads
+        behind a semaphore and land in the content-addressed cache; each
+        record then goes through the normal calculate_score path, which
+        picks up its cached analysis instead of blocking sequentially.
+        """
+        if not records:
+            return []
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+        await asyncio.gather(*(
+            self._get_medical_analysis_async(
+                record.get('product_name', 'Unknown Product'),
+                record.get('ingredients', []) or [],
+                record.get('nutrition', {}) or {},
+                semaphore
+            )
+            for record in records
+        ))
+
+        return [self.calculate_score(record) for record in records]
+
     def _calculate_nutrition_scores(self, nutrition: Dict[str, float]) -> Dict[str, Any]:
         """Calculate scores based on nutrition data"""
+        # One broadcast compare applies all six nutrition rules at once:
+        # count thresholds <= value per row, then gather the impacts. The
+        # defaults merge plus itemgetter pulls all six values in a single
+        # C-level pass instead of six .get probes (None still means 0)
+        values = np.fromiter(
+            (value or 0 for value in
+             self._NUTRITION_GETTER({**self._NUTRITION_DEFAULTS, **nutrition})),
+            dtype=np.float64, count=6
+        )
+        idx = (values[:, None] >= self._thr_v_matrix).sum(axis=1)
+        impacts = np.where(
+            idx > 0,
+            self._thr_i_matrix[self._nutri_rows, np.maximum(idx - 1, 0)],
+            0
+        )
+
         scores = {}
-        
-        # Sugar content scoring
-        sugar = nutrition.get('sugar', 0)
-        sugar_score = self._apply_rule('sugar_content', sugar)
-        if sugar_score['score_impact'] != 0:
-            scores['sugar_content'] = sugar_score
-        
-        # Sodium content scoring
-        sodium = nutrition.get('sodium', 0)
-        sodium_score = self._apply_rule('sodium_content', sodium)
-        if sodium_score['score_impact'] != 0:
-            scores['sodium_content'] = sodium_score
-        
-        # Saturated fat scoring
-        saturated_fat = nutrition.get('saturated_fat', 0)
-        saturated_fat_score = self._apply_rule('saturated_fat', saturated_fat)
-        if saturated_fat_score['score_impact'] != 0:
-            scores['saturated_fat'] = saturated_fat_score
-        
-        # Trans fat scoring
-        trans_fat = nutrition.get('trans_fat', 0)
-        trans_fat_score = self._apply_rule('trans_fat', trans_fat)
-        if trans_fat_score['score_impact'] != 0:
-            scores['trans_fat'] = trans_fat_score
-        
-        # Fiber content scoring (positive)
-        fiber = nutrition.get('fiber', 0)
-        fiber_score = self._apply_rule('fiber_content', fiber)
-        if fiber_score['score_impact'] != 0:
-            scores['fiber_content'] = fiber_score
-        
-        # Protein content scoring (positive)
-        protein = nutrition.get('protein', 0)
-        protein_score = self._apply_rule('protein_content', protein)
-        if protein_score['score_impact'] != 0:
-            scores['protein_content'] = protein_score
-        
+        for row, rule_name in enumerate(self._nutri_rule_names):
+            impact = int(impacts[row])
+            if impact != 0:
+                rule_id = self._rule_idx[rule_name]
+                scores[rule_name] = {
+                    'rule_name': rule_name,
+                    'value': float(values[row]),
+                    'score_impact': impact,
+                    'description': self._rule_desc[rule_id],
+                    'source': self._rule_source[rule_id],
+                    'thresholds': self._rule_thresholds[rule_id]
+                }
+
         return scores
     
     def _calculate_ingredient_scores(self, normalized_data: Dict[str, Any]) -> Dict[str, Any]:
         """Calculate scores based on ingredient analysis"""
         scores = {}
         
-        # Additives count scoring
-        additives = normalized_data.get('additives', [])
-        additives_count = len(additives)
-        additives_score = self._apply_rule('additives_count', additives_count)
-        if additives_score['score_impact'] != 0:
-            scores['additives_count'] = additives_score
-        
-        # Preservatives scoring
-        preservatives = normalized_data.get('preservatives', [])
-        preservatives_count = len(preservatives)
-        preservatives_score = self._apply_rule('preservatives', preservatives_count)
-        if preservatives_score['score_impact'] != 0:
-            scores['preservatives'] = preservatives_score
-        
-        # Artificial colors scoring
-        artificial_colors = normalized_data.get('artificial_colors', [])
-        colors_count = len(artificial_colors)
-        colors_score = self._apply_rule('artificial_colors', colors_count)
-        if colors_score['score_impact'] != 0:
-            scores['artificial_colors'] = colors_score
-        
+        # Count-based rules (additives, preservatives, colors, sweeteners)
+        for src_key, rule_name in self._INGREDIENT_RULES:
+            count = len(normalized_data.get(src_key, ()))
+            impact = self._impact_for(rule_name, count)
+            if impact:
+                scores[rule_name] = self._rule_record(rule_name, count, impact)
+
         # Natural ratio scoring (positive)
         natural_ratio = normalized_data.get('natural_ratio', 0)
-        natural_score = self._apply_rule('natural_ratio', natural_ratio)
-        if natural_score['score_impact'] != 0:
-            scores['natural_ratio'] = natural_score
-        
-        # Artificial sweeteners scoring
-        artificial_sweeteners = normalized_data.get('artificial_sweeteners', [])
-        sweeteners_count = len(artificial_sweeteners)
-        sweeteners_score = self._apply_rule('artificial_sweeteners', sweeteners_count)
-        if sweeteners_score['score_impact'] != 0:
-            scores['artificial_sweeteners'] = sweeteners_score
-        
+        impact = self._impact_for('natural_ratio', natural_ratio)
+        if impact:
+            scores['natural_ratio'] = self._rule_record('natural_ratio', natural_ratio, impact)
+
         return scores
     
-    def _apply_rule(self, rule_name: str, value: float) -> Dict[str, Any]:
-        """Apply a specific scoring rule to a value"""
-        if rule_name not in self.scoring_rules:
-            return {'score_impact': 0, 'rule_name': rule_name, 'value': value}
-        
-        rule = self.scoring_rules[rule_name]
-        thresholds = rule['thresholds']
-        
-        # Find the appropriate threshold
-        score_impact = 0
-        for threshold_value, impact in thresholds:
-            if value >= threshold_value:
-                score_impact = impact
-            else:
-                break
-        
+    def _impact_for(self, rule_name: str, value: float) -> int:
+        """Return a rule's score impact without materializing a record"""
+        value_col = self._thr_v_t.get(rule_name)
+        # Fast path: below the first threshold there is nothing to report
+        if value_col is None or value < value_col[0]:
+            return 0
+
+        # Find the appropriate threshold: index of the last threshold <= value
+        idx = bisect.bisect_right(value_col, value)
+        return self._thr_i_t[rule_name][idx - 1] if idx else 0
+
+    def _rule_record(self, rule_name: str, value: float, score_impact: int) -> Dict[str, Any]:
+        """Materialize the reportable record for a triggered rule"""
+        rule_id = self._rule_idx[rule_name]
         return {
             'rule_name': rule_name,
             'value': value,
             'score_impact': score_impact,
-            'description': rule['description'],
-            'source': rule['source'],
-            'thresholds': thresholds
+            'description': self._rule_desc[rule_id],
+            'source': self._rule_source[rule_id],
+            'thresholds': self._rule_thresholds[rule_id]
         }
+
+    def _apply_rule(self, rule_name: str, value: float) -> Dict[str, Any]:
+        """Apply a specific scoring rule to a value"""
+        if rule_name not in self._RULE_NAMES:
+            return {'score_impact': 0, 'rule_name': rule_name, 'value': value}
+
+        # Fresh small dict per call: callers own the result, and the shape
+        # matches the unknown-rule branch above
+        score_impact = self._impact_for(rule_name, value)
+        if score_impact == 0:
+            return {'score_impact': 0, 'rule_name': rule_name, 'value': value}
+
+        return self._rule_record(rule_name, value, score_impact)
     
     def _determine_health_band(self, score: int) -> str:
         """Determine health band based on score"""
@@ -290,39 +544,61 @@ class HealthScoringEngine:
             return f"No scoring rule found for {component}"
         
         rule = self.scoring_rules[component]
-        score_info = self._apply_rule(component, value)
-        
-        if score_info['score_impact'] > 0:
-            return f"Good {rule['description']}: {value} (bonus: +{score_info['score_impact']} points)"
-        elif score_info['score_impact'] < 0:
-            return f"High {rule['description']}: {value} (penalty: {score_info['score_impact']} points)"
+        score_impact = self._impact_for(component, value)
+
+        if score_impact > 0:
+            return f"Good {rule['description']}: {value} (bonus: +{score_impact} points)"
+        elif score_impact < 0:
+            return f"High {rule['description']}: {value} (penalty: {score_impact} points)"
         else:
             return f"Moderate {rule['description']}: {value} (no impact on score)"
     
     def _get_medical_analysis(self, product_name: str, ingredients: List[str], nutrition: Dict[str, float]) -> Dict[str, Any]:
         """Get medical analysis from BioMistral LLM"""
-        if not MEDICAL_LLM_AVAILABLE or not medical_llm_service:
+        if not MEDICAL_LLM_AVAILABLE or get_medical_llm_service is None:
             return {'error': 'Medical LLM service not available'}
-            
+
+        # Content-addressed lookup: the analysis is deterministic in its inputs
         try:
+            key_src = '%s|%s|%s' % (
+                product_name,
+                '|'.join(sorted(ingredients)),
+                json.dumps(nutrition, sort_keys=True, default=str)
+            )
+            cache_key = hashlib.blake2b(key_src.encode('utf-8'), digest_size=16).digest()
+        except TypeError:
+            cache_key = None
+
+        if cache_key is not None:
+            cached = self._med_cache.get(cache_key)
+            if cached is not None:
+                self._med_cache.move_to_end(cache_key)
+                return cached
+
+        try:
+            medical_llm_service = get_medical_llm_service()
             # Convert nutrition values to strings for medical LLM
             nutrition_str = {}
+            unit_suffix = self._UNIT_SUFFIX
             for key, value in nutrition.items():
                 if isinstance(value, (int, float)):
-                    if 'sodium' in key.lower():
-                        nutrition_str[key] = f"{value}mg"
-                    elif 'sugar' in key.lower() or 'fat' in key.lower() or 'protein' in key.lower() or 'fiber' in key.lower():
-                        nutrition_str[key] = f"{value}g"
-                    else:
-                        nutrition_str[key] = f"{value}"
+                    nutrition_str[key] = f"{value}{unit_suffix.get(key.lower(), '')}"
                 else:
                     nutrition_str[key] = str(value)
             
-            return medical_llm_service.analyze_food_nutrition(
+            analysis = medical_llm_service.analyze_food_nutrition(
                 product_name=product_name,
                 ingredients=ingredients,
                 nutrition_facts=nutrition_str
             )
+
+            # Cache successful analyses only; transient failures should retry
+            if cache_key is not None and 'error' not in analysis:
+                self._med_cache[cache_key] = analysis
+                if len(self._med_cache) > 1024:
+                    self._med_cache.popitem(last=False)
+
+            return analysis
         except Exception as e:
             return {'error': f'Medical analysis failed: {str(e)}'}
     
@@ -365,8 +641,8 @@ class HealthScoringEngine:
             if nutrient_analysis:
                 # Check for high-risk nutrients
                 high_risk_penalty = 0
-                for nutrient, analysis in nutrient_analysis.items():
-                    if any(risk_word in analysis.lower() for risk_word in ['high', 'excess', 'risk', 'concern']):
+                for analysis in nutrient_analysis.values():
+                    if isinstance(analysis, str) and _has_risk_keyword(analysis):
                         high_risk_penalty -= 3
                 
                 if high_risk_penalty < 0:
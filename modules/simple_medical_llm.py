@@ -5,36 +5,126 @@ Uses a more accessible model for medical-grade analysis
 
 import os
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import json
 import re
+from dataclasses import asdict, dataclass
 from datetime import datetime
+from types import MappingProxyType
 
-# Try to import ML dependencies, fallback to demo mode if not available
-try:
-    import torch
-    from transformers import (
-        AutoTokenizer, 
-        AutoModelForCausalLM, 
-        pipeline
-    )
-    ML_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: ML dependencies not available: {e}")
-    print("Running in demo mode...")
-    ML_AVAILABLE = False
+import numpy as np
+
+# ML dependencies are imported lazily in load_model so that merely
+# importing this module (e.g. for demo-mode analysis) does not pay the
+# torch import and CUDA probe cost
+torch = None
+AutoTokenizer = None
+AutoModelForCausalLM = None
+ML_AVAILABLE = None
+
+def _import_ml_dependencies() -> bool:
+    """
+    Import torch/transformers on first use, fallback to demo mode
+    """
+    global torch, AutoTokenizer, AutoModelForCausalLM, ML_AVAILABLE
+    if ML_AVAILABLE is not None:
+        return ML_AVAILABLE
+
+    try:
+        import torch as _torch
+        from transformers import (
+            AutoTokenizer as _AutoTokenizer,
+            AutoModelForCausalLM as _AutoModelForCausalLM
+        )
+        torch = _torch
+        AutoTokenizer = _AutoTokenizer
+        AutoModelForCausalLM = _AutoModelForCausalLM
+        ML_AVAILABLE = True
+    except ImportError as e:
+        print(f"Warning: ML dependencies not available: {e}")
+        print("Running in demo mode...")
+        ML_AVAILABLE = False
+
+    return ML_AVAILABLE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Precompiled health-score pattern (hot path for every LLM response)
+_SCORE_RE = re.compile(r'health score[:\s]*(\d+)')
+
+# All concern/recommendation keywords in one alternation: a single pass
+# over the (already lowercased) response replaces five substring scans
+_KEYWORDS_RE = re.compile(r'high sodium|high sugar|saturated fat|reduce|balance')
+
+@dataclass(slots=True)
+class MedicalAnalysis:
+    """
+    Structured result of one product analysis
+
+    Slotted dataclass instead of a per-call dict: fixed fields are cheaper
+    to build and access internally, and to_dict() produces the plain dict
+    only where the result crosses the API boundary.
+    """
+    medical_health_score: int
+    key_concerns: List[str]
+    nutrient_risks: List[str]
+    medical_recommendations: List[str]
+    contraindications: List[str]
+    analysis_source: str
+    analysis_timestamp: str
+    raw_analysis: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain-dict view for JSON serialization"""
+        return asdict(self)
+
+# Medical nutrition guidelines - built once at module scope and shared
+# read-only across instances
+_MEDICAL_GUIDELINES = MappingProxyType({
+    "who_guidelines": {
+        "sodium": {"max_daily": 2000, "unit": "mg"},
+        "sugar": {"max_daily": 50, "unit": "g"},
+        "saturated_fat": {"max_daily": 22, "unit": "g"},
+        "trans_fat": {"max_daily": 2, "unit": "g"},
+    },
+    "fda_guidelines": {
+        "calories": {"high": 400, "unit": "kcal"},
+        "sodium": {"high": 600, "unit": "mg"},
+        "sugar": {"high": 12, "unit": "g"},
+    },
+    "fssai_guidelines": {
+        "sodium": {"max_daily": 2000, "unit": "mg"},
+        "sugar": {"max_daily": 50, "unit": "g"},
+        "saturated_fat": {"max_daily": 22, "unit": "g"},
+    }
+})
+
 class SimpleMedicalLLMService:
     """
     Simple Medical LLM Service for food nutrition analysis
     Uses accessible models that work without authentication
     """
-    
+
+    # Fixed attribute layout: instances skip the per-object __dict__ and
+    # attribute access goes through fixed slot offsets
+    __slots__ = (
+        'model_options', 'model_name', 'tokenizer', 'model',
+        'device', 'is_loaded', 'medical_guidelines',
+        '_header_ids', '_footer_ids', '_host_buf'
+    )
+
+    # Capacity of the pinned staging buffer, in tokens; prompts longer
+    # than this fall back to a regular pageable transfer
+    _HOST_BUF_LEN = 512
+
     def __init__(self):
+        # Persist compiled Inductor kernels across restarts so a warm
+        # start skips the one-off torch.compile cost; deployers can point
+        # this at a volume the same way HF_MODELS_CACHE works elsewhere
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", "./torch_compile_cache")
+
         # Use more accessible models
         self.model_options = [
             "microsoft/DialoGPT-medium",  # Conversational model
@@ -44,38 +134,28 @@ class SimpleMedicalLLMService:
         self.model_name = self.model_options[0]
         self.tokenizer = None
         self.model = None
-        self.pipeline = None
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        # Resolved in load_model once torch is actually imported
+        self.device = "cpu"
         self.is_loaded = False
+        # Token ids of the constant prompt header/footer, cached at load
+        self._header_ids = None
+        self._footer_ids = None
+        # Pinned host tensor reused to stage prompt ids to the GPU
+        self._host_buf = None
         
-        # Medical nutrition guidelines
-        self.medical_guidelines = {
-            "who_guidelines": {
-                "sodium": {"max_daily": 2000, "unit": "mg"},
-                "sugar": {"max_daily": 50, "unit": "g"},
-                "saturated_fat": {"max_daily": 22, "unit": "g"},
-                "trans_fat": {"max_daily": 2, "unit": "g"},
-            },
-            "fda_guidelines": {
-                "calories": {"high": 400, "unit": "kcal"},
-                "sodium": {"high": 600, "unit": "mg"},
-                "sugar": {"high": 12, "unit": "g"},
-            },
-            "fssai_guidelines": {
-                "sodium": {"max_daily": 2000, "unit": "mg"},
-                "sugar": {"max_daily": 50, "unit": "g"},
-                "saturated_fat": {"max_daily": 22, "unit": "g"},
-            }
-        }
+        # Medical nutrition guidelines - shared read-only view
+        self.medical_guidelines = _MEDICAL_GUIDELINES
     
     def load_model(self) -> bool:
         """
         Load a medical LLM model
         """
-        if not ML_AVAILABLE:
+        if not _import_ml_dependencies():
             logger.info("ML dependencies not available, using demo mode")
             return False
-            
+
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+
         for model_name in self.model_options:
             try:
                 logger.info(f"Loading {model_name} on {self.device}...")
@@ -86,25 +166,98 @@ class SimpleMedicalLLMService:
                 # Add padding token if not present
                 if self.tokenizer.pad_token is None:
                     self.tokenizer.pad_token = self.tokenizer.eos_token
+
+                # Causal LMs need left padding so every prompt ends at the
+                # same position; left truncation keeps the "Analysis:" tail
+                # when an oversized prompt has to be cut
+                self.tokenizer.padding_side = "left"
+                self.tokenizer.truncation_side = "left"
+
+                # Cache the token ids of the constant prompt header and
+                # footer; per request only the variable middle gets
+                # tokenized and the three pieces are concatenated
+                self._header_ids = self.tokenizer(
+                    self._PROMPT_HEADER, return_tensors="pt"
+                ).input_ids
+                self._footer_ids = self.tokenizer(
+                    self._PROMPT_FOOTER, add_special_tokens=False,
+                    return_tensors="pt"
+                ).input_ids
                 
+                # Quantize to int8 on GPU when bitsandbytes is installed:
+                # decoding is memory-bound on weight bytes, and LLM.int8
+                # vector-wise quantization (FP16 outlier decomposition)
+                # quarters them with accuracy intact
+                load_in_8bit = False
+                if self.device == "cuda":
+                    try:
+                        import bitsandbytes  # noqa: F401
+                        load_in_8bit = True
+                    except ImportError:
+                        logger.info("bitsandbytes not available, loading unquantized")
+
                 # Load model
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    model_name,
-                    torch_dtype=torch.float32
-                )
-                
-                # Create pipeline
-                self.pipeline = pipeline(
-                    "text-generation",
-                    model=self.model,
-                    tokenizer=self.tokenizer,
-                    max_length=256,
-                    do_sample=True,
-                    temperature=0.7,
-                    top_p=0.9,
-                    pad_token_id=self.tokenizer.eos_token_id
-                )
+                if load_in_8bit:
+                    self.model = AutoModelForCausalLM.from_pretrained(
+                        model_name,
+                        device_map="auto",
+                        load_in_8bit=True,
+                        llm_int8_threshold=6.0
+                    )
+                else:
+                    # bf16 halves weight bytes moved per decode step on
+                    # GPUs with native support and is more numerically
+                    # stable than fp16; older GPUs keep fp16, CPU float32
+                    if self.device == "cuda":
+                        compute_dtype = (
+                            torch.bfloat16 if torch.cuda.is_bf16_supported()
+                            else torch.float16
+                        )
+                    else:
+                        compute_dtype = torch.float32
+                    self.model = AutoModelForCausalLM.from_pretrained(
+                        model_name,
+                        torch_dtype=compute_dtype
+                    )
                 
+                self.model.eval()
+
+                # Compile the module directly; generate() below forwards
+                # through it, and reduce-overhead mode targets exactly this
+                # repeated single-batch decode pattern
+                if hasattr(torch, "compile"):
+                    try:
+                        self.model = torch.compile(
+                            self.model, mode="reduce-overhead", fullgraph=False
+                        )
+                    except Exception as e:
+                        logger.warning(f"torch.compile unavailable: {e}")
+
+                # One warmup call pays the Inductor compilation cost here
+                # instead of on the first real request
+                try:
+                    warm = self.tokenizer("warmup", return_tensors="pt").to(self.model.device)
+                    with torch.inference_mode():
+                        self.model.generate(
+                            **warm, max_new_tokens=16,
+                            pad_token_id=self.tokenizer.eos_token_id
+                        )
+                except Exception as e:
+                    logger.warning(f"Warmup generation failed: {e}")
+
+                # Pinned staging buffer: reusing one page-locked host
+                # tensor avoids a fresh allocation plus pageable-memory
+                # staging copy on every prompt upload, and non_blocking
+                # transfers can overlap with kernel launches
+                if self.device == "cuda":
+                    try:
+                        self._host_buf = torch.empty(
+                            (1, self._HOST_BUF_LEN), dtype=torch.long,
+                            pin_memory=True
+                        )
+                    except Exception:
+                        self._host_buf = None
+
                 self.model_name = model_name
                 self.is_loaded = True
                 logger.info(f"✅ {model_name} loaded successfully!")
@@ -126,179 +279,354 @@ class SimpleMedicalLLMService:
         """
         Analyze food product using medical-grade LLM
         """
+        # Score, risks, and contraindications feed both the LLM-parse path
+        # and the demo fallback; evaluate them once up front instead of
+        # once per path
+        evaluated = self._evaluate(nutrition_facts)
+
         if not self.is_loaded:
-            return self._demo_analysis(product_name, ingredients, nutrition_facts, barcode)
-        
+            return self._demo_analysis(
+                product_name, ingredients, nutrition_facts, barcode,
+                evaluated=evaluated
+            ).to_dict()
+
         try:
-            # Create medical analysis prompt
-            prompt = self._create_medical_prompt(product_name, ingredients, nutrition_facts, barcode)
-            
-            # Generate analysis using LLM
-            response = self.pipeline(
-                prompt,
-                max_length=len(prompt.split()) + 200,
-                num_return_sequences=1,
-                temperature=0.7,
-                do_sample=True,
-                pad_token_id=self.tokenizer.eos_token_id
-            )
-            
-            # Extract analysis from response
-            analysis_text = response[0]['generated_text']
-            analysis_text = analysis_text.replace(prompt, "").strip()
+            # Generate analysis with a direct generate() call: the pipeline
+            # wrapper repeats attention-mask setup and postprocessing per
+            # call, and its prompt-echo output forced a string replace here
+            inputs = self._encode_prompt(product_name, ingredients, nutrition_facts)
+            prompt_len = inputs["input_ids"].shape[1]
+            # inference_mode also skips the view/version-counter bookkeeping
+            # that plain no-grad execution still pays
+            with torch.inference_mode():
+                # Greedy decoding: skips per-token RNG and top-p logit
+                # sorting, and keeps medical output reproducible
+                output = self.model.generate(
+                    **inputs,
+                    max_new_tokens=200,
+                    do_sample=False,
+                    num_beams=1,
+                    pad_token_id=self.tokenizer.eos_token_id,
+                    use_cache=True
+                )
+
+            # Decode only the newly generated tokens past the prompt
+            analysis_text = self.tokenizer.decode(
+                output[0, prompt_len:], skip_special_tokens=True
+            ).strip()
             
             # Parse the analysis
-            return self._parse_medical_analysis(analysis_text, nutrition_facts)
-            
+            return self._parse_medical_analysis(
+                analysis_text, nutrition_facts, evaluated=evaluated
+            ).to_dict()
+
         except Exception as e:
             logger.error(f"LLM analysis failed: {e}")
-            return self._demo_analysis(product_name, ingredients, nutrition_facts, barcode)
-    
-    def _create_medical_prompt(self, product_name: str, ingredients: List[str], 
+            return self._demo_analysis(
+                product_name, ingredients, nutrition_facts, barcode,
+                evaluated=evaluated
+            ).to_dict()
+
+    def analyze_food_nutrition_batch(self,
+                                     items: List[Tuple[str, List[str], Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Analyze several products with one batched generate call
+
+        Each item is a (product_name, ingredients, nutrition_facts) tuple;
+        padding the prompts together and decoding them in a single pass
+        keeps the model busy instead of serializing one request at a time.
+        """
+        if not items:
+            return []
+
+        # One timestamp per batch; the clock read and string format are
+        # negligible per call but add up over a database sweep
+        ts = datetime.now().isoformat()
+
+        # One fused evaluation per item, shared by whichever path produces
+        # the final result
+        evaluated = [self._evaluate(nutrition) for _, _, nutrition in items]
+
+        if not self.is_loaded:
+            return [
+                self._demo_analysis(name, ingredients, nutrition, now=ts,
+                                    evaluated=ev).to_dict()
+                for (name, ingredients, nutrition), ev in zip(items, evaluated)
+            ]
+
+        try:
+            prompts = [
+                self._create_medical_prompt(name, ingredients, nutrition)
+                for name, ingredients, nutrition in items
+            ]
+            # Pad to the longest prompt in the batch, not a fixed cap, so
+            # short batches do not decode over rows of padding
+            enc = self.tokenizer(
+                prompts, padding="longest", truncation=True, return_tensors="pt"
+            )
+            enc = enc.to(self.model.device)
+            with torch.inference_mode():
+                output = self.model.generate(
+                    **enc,
+                    max_new_tokens=200,
+                    do_sample=False,
+                    num_beams=1,
+                    pad_token_id=self.tokenizer.eos_token_id,
+                    use_cache=True
+                )
+
+            # Every row shares the padded prompt length; decode only the
+            # generated tails, then parse on the CPU
+            texts = self.tokenizer.batch_decode(
+                output[:, enc.input_ids.shape[1]:], skip_special_tokens=True
+            )
+            return [
+                self._parse_medical_analysis(text.strip(), nutrition, now=ts,
+                                             evaluated=ev).to_dict()
+                for text, (_, _, nutrition), ev in zip(texts, items, evaluated)
+            ]
+
+        except Exception as e:
+            logger.error(f"Batched LLM analysis failed: {e}")
+            return [
+                self._demo_analysis(name, ingredients, nutrition, now=ts,
+                                    evaluated=ev).to_dict()
+                for (name, ingredients, nutrition), ev in zip(items, evaluated)
+            ]
+
+    # Flat view of the demo thresholds for the vectorized batch path:
+    # per-key threshold, penalty slope past it, and penalty cap, in the
+    # same order as the keys tuple
+    _BATCH_KEYS = ('sodium', 'total_sugars', 'saturated_fat')
+    _BATCH_THRESH = np.array([600.0, 12.0, 5.0])
+    _BATCH_SLOPE = np.array([0.1, 2.0, 3.0])
+    _BATCH_CAP = np.array([30.0, 25.0, 20.0])
+
+    def assess_batch(self, nutrition_facts_list: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Vectorized demo health scores for a list of nutrition dicts
+
+        Stacks the three guideline nutrients into an (N, 3) array and
+        applies threshold, slope, and cap with broadcast operations, so a
+        database sweep scores thousands of products without a Python-level
+        branch per row. Matches _evaluate's scoring up to its integer
+        flooring of the sodium penalty.
+        """
+        if not nutrition_facts_list:
+            return np.zeros(0, dtype=np.float32)
+
+        values = np.array(
+            [
+                [nf.get(key, 0) or 0 for key in self._BATCH_KEYS]
+                for nf in nutrition_facts_list
+            ],
+            dtype=np.float32
+        )
+        penalties = np.clip(
+            (values - self._BATCH_THRESH) * self._BATCH_SLOPE, 0, self._BATCH_CAP
+        )
+        return np.maximum(100.0 - penalties.sum(axis=1), 0.0)
+
+    # Prompt skeleton built once at class load; per-call work is reduced to
+    # one format() plus the two joins over the variable parts. Header and
+    # footer are split out so their token ids can be cached at model load.
+    _PROMPT_HEADER = (
+        "MEDICAL NUTRITION ANALYSIS\n"
+        "\n"
+        "Product: "
+    )
+    _PROMPT_MIDDLE = (
+        "{p}\n"
+        "Ingredients: {i}\n"
+        "Nutrition Facts (per 100g):\n"
+        "{n}"
+    )
+    _PROMPT_FOOTER = (
+        "\n"
+        "\n"
+        "Please provide a medical-grade analysis including:\n"
+        "1. Health Score (0-100)\n"
+        "2. Key Health Concerns\n"
+        "3. Nutrient Risks\n"
+        "4. Medical Recommendations\n"
+        "5. Contraindications\n"
+        "\n"
+        "Analysis:"
+    )
+    _PROMPT_TMPL = _PROMPT_HEADER + _PROMPT_MIDDLE + _PROMPT_FOOTER
+
+    def _encode_prompt(self, product_name: str, ingredients: List[str],
+                       nutrition_facts: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Tokenize a single prompt, reusing the cached header/footer ids
+
+        Only the variable middle of the prompt is tokenized per request;
+        the constant pieces are concatenated from ids computed at load
+        time. Piecewise tokenization can merge differently right at the
+        seams than one whole-string pass, which is harmless here. The
+        batched path keeps whole-prompt tokenization because left padding
+        has to stay outermost.
+        """
+        if self._header_ids is None:
+            prompt = self._create_medical_prompt(product_name, ingredients, nutrition_facts)
+            return self.tokenizer(
+                prompt, return_tensors="pt", padding=True
+            ).to(self.model.device)
+
+        nutrition_str = "\n".join(
+            f"{k}: {v}" for k, v in nutrition_facts.items() if v is not None
+        )
+        middle_ids = self.tokenizer(
+            self._PROMPT_MIDDLE.format(
+                p=product_name, i=", ".join(ingredients), n=nutrition_str
+            ),
+            add_special_tokens=False, return_tensors="pt"
+        ).input_ids
+        ids = torch.cat([self._header_ids, middle_ids, self._footer_ids], dim=1)
+        length = ids.shape[1]
+        if self._host_buf is not None and length <= self._HOST_BUF_LEN:
+            # Stage through the pinned buffer so the H2D copy skips the
+            # pageable staging pass and can overlap with launches
+            self._host_buf[0, :length].copy_(ids[0])
+            input_ids = self._host_buf[:, :length].to(
+                self.model.device, non_blocking=True
+            )
+        else:
+            input_ids = ids.to(self.model.device)
+        return {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids)
+        }
+
+    def _create_medical_prompt(self, product_name: str, ingredients: List[str],
                              nutrition_facts: Dict[str, Any], barcode: Optional[str] = None) -> str:
         """Create a medical analysis prompt"""
-        
-        # Format nutrition facts
-        nutrition_str = "\n".join([f"{k}: {v}" for k, v in nutrition_facts.items() if v is not None])
-        
-        prompt = f"""
-MEDICAL NUTRITION ANALYSIS
-
-Product: {product_name}
-Ingredients: {', '.join(ingredients)}
-Nutrition Facts (per 100g):
-{nutrition_str}
-
-Please provide a medical-grade analysis including:
-1. Health Score (0-100)
-2. Key Health Concerns
-3. Nutrient Risks
-4. Medical Recommendations
-5. Contraindications
-
-Analysis:
-"""
-        return prompt.strip()
+
+        # Format nutrition facts (generator avoids an intermediate list)
+        nutrition_str = "\n".join(
+            f"{k}: {v}" for k, v in nutrition_facts.items() if v is not None
+        )
+
+        return self._PROMPT_TMPL.format(
+            p=product_name, i=", ".join(ingredients), n=nutrition_str
+        )
     
-    def _parse_medical_analysis(self, analysis_text: str, nutrition_facts: Dict[str, Any]) -> Dict[str, Any]:
+    def _parse_medical_analysis(self, analysis_text: str, nutrition_facts: Dict[str, Any],
+                                now: Optional[str] = None,
+                                evaluated: Optional[Tuple[int, List[str], List[str]]] = None) -> MedicalAnalysis:
         """Parse LLM analysis into structured format"""
-        
+        if evaluated is None:
+            evaluated = self._evaluate(nutrition_facts)
+
+        # Lowercase once; every extraction below scans this string
+        low = analysis_text.lower()
+
         # Extract health score
         health_score = 70  # Default
-        score_match = re.search(r'health score[:\s]*(\d+)', analysis_text.lower())
+        score_match = _SCORE_RE.search(low)
         if score_match:
             health_score = int(score_match.group(1))
-        
+
+        # One linear pass collects every keyword hit
+        hits = {match.group(0) for match in _KEYWORDS_RE.finditer(low)}
+
         # Extract key concerns
         concerns = []
-        if "high sodium" in analysis_text.lower():
+        if "high sodium" in hits:
             concerns.append("High sodium content may increase blood pressure risk")
-        if "high sugar" in analysis_text.lower():
+        if "high sugar" in hits:
             concerns.append("High sugar content may contribute to diabetes risk")
-        if "saturated fat" in analysis_text.lower():
+        if "saturated fat" in hits:
             concerns.append("Saturated fat content may affect cardiovascular health")
-        
+
         # Extract recommendations
         recommendations = []
-        if "reduce" in analysis_text.lower():
+        if "reduce" in hits:
             recommendations.append("Consider reducing portion size")
-        if "balance" in analysis_text.lower():
+        if "balance" in hits:
             recommendations.append("Balance with other nutritious foods")
         
-        return {
-            "medical_health_score": health_score,
-            "key_concerns": concerns,
-            "nutrient_risks": self._assess_nutrient_risks(nutrition_facts),
-            "medical_recommendations": recommendations,
-            "contraindications": self._get_contraindications(nutrition_facts),
-            "analysis_source": f"Medical LLM ({self.model_name})",
-            "analysis_timestamp": datetime.now().isoformat(),
-            "raw_analysis": analysis_text
-        }
+        return MedicalAnalysis(
+            medical_health_score=health_score,
+            key_concerns=concerns,
+            nutrient_risks=evaluated[1],
+            medical_recommendations=recommendations,
+            contraindications=evaluated[2],
+            analysis_source=f"Medical LLM ({self.model_name})",
+            analysis_timestamp=now or datetime.now().isoformat(),
+            raw_analysis=analysis_text
+        )
     
-    def _assess_nutrient_risks(self, nutrition_facts: Dict[str, Any]) -> List[str]:
-        """Assess nutrient risks based on medical guidelines"""
+    def _evaluate(self, nutrition_facts: Dict[str, Any]) -> Tuple[int, List[str], List[str]]:
+        """
+        Compute demo health score, nutrient risks, and contraindications
+        in one pass
+
+        The three sibling helpers probed the same sodium/sugar/saturated-fat
+        keys and re-ran the same threshold branches independently; fusing
+        them means each key is read and compared exactly once.
+        """
+        sodium = nutrition_facts.get('sodium', 0) or 0
+        sugar = nutrition_facts.get('total_sugars', 0) or 0
+        sat_fat = nutrition_facts.get('saturated_fat', 0) or 0
+
+        score = 100
         risks = []
-        
-        # Check sodium
-        sodium = nutrition_facts.get('sodium', 0)
+        contraindications = []
+
         if sodium > 600:  # High sodium threshold
+            score -= min(30, (sodium - 600) // 10)
             risks.append(f"High sodium content ({sodium}mg) exceeds recommended limits")
-        
-        # Check sugar
-        sugar = nutrition_facts.get('total_sugars', 0)
+            contraindications.append("Not recommended for individuals with hypertension")
+
         if sugar > 12:  # High sugar threshold
+            score -= min(25, (sugar - 12) * 2)
             risks.append(f"High sugar content ({sugar}g) may contribute to health risks")
-        
-        # Check saturated fat
-        sat_fat = nutrition_facts.get('saturated_fat', 0)
+            contraindications.append("Not recommended for individuals with diabetes")
+
         if sat_fat > 5:  # High saturated fat threshold
+            score -= min(20, (sat_fat - 5) * 3)
             risks.append(f"High saturated fat content ({sat_fat}g) may affect heart health")
-        
-        return risks
-    
+
+        return max(0, score), risks, contraindications
+
+    def _assess_nutrient_risks(self, nutrition_facts: Dict[str, Any]) -> List[str]:
+        """Assess nutrient risks based on medical guidelines"""
+        return self._evaluate(nutrition_facts)[1]
+
     def _get_contraindications(self, nutrition_facts: Dict[str, Any]) -> List[str]:
         """Get medical contraindications"""
-        contraindications = []
-        
-        # High sodium contraindications
-        sodium = nutrition_facts.get('sodium', 0)
-        if sodium > 600:
-            contraindications.append("Not recommended for individuals with hypertension")
-        
-        # High sugar contraindications
-        sugar = nutrition_facts.get('total_sugars', 0)
-        if sugar > 12:
-            contraindications.append("Not recommended for individuals with diabetes")
-        
-        return contraindications
-    
-    def _demo_analysis(self, product_name: str, ingredients: List[str], 
-                      nutrition_facts: Dict[str, Any], barcode: Optional[str] = None) -> Dict[str, Any]:
+        return self._evaluate(nutrition_facts)[2]
+
+    def _demo_analysis(self, product_name: str, ingredients: List[str],
+                      nutrition_facts: Dict[str, Any], barcode: Optional[str] = None,
+                      now: Optional[str] = None,
+                      evaluated: Optional[Tuple[int, List[str], List[str]]] = None) -> MedicalAnalysis:
         """Demo analysis when LLM is not available"""
-        
-        # Calculate basic health score
-        health_score = self._calculate_demo_health_score(nutrition_facts)
-        
-        # Assess risks
-        risks = self._assess_nutrient_risks(nutrition_facts)
-        
-        # Get contraindications
-        contraindications = self._get_contraindications(nutrition_facts)
-        
-        return {
-            "medical_health_score": health_score,
-            "key_concerns": risks[:3],  # Top 3 concerns
-            "nutrient_risks": risks,
-            "medical_recommendations": [
+
+        # Score, risks, and contraindications all come from one fused pass
+        if evaluated is None:
+            evaluated = self._evaluate(nutrition_facts)
+        health_score, risks, contraindications = evaluated
+
+        return MedicalAnalysis(
+            medical_health_score=health_score,
+            key_concerns=risks[:3],  # Top 3 concerns
+            nutrient_risks=risks,
+            medical_recommendations=[
                 "Consult with healthcare provider for personalized advice",
                 "Consider portion control for optimal health",
                 "Balance with other nutritious foods"
             ],
-            "contraindications": contraindications,
-            "analysis_source": "Medical Guidelines (Demo Mode)",
-            "analysis_timestamp": datetime.now().isoformat(),
-            "raw_analysis": f"Demo analysis for {product_name} based on medical guidelines"
-        }
+            contraindications=contraindications,
+            analysis_source="Medical Guidelines (Demo Mode)",
+            analysis_timestamp=now or datetime.now().isoformat(),
+            raw_analysis=f"Demo analysis for {product_name} based on medical guidelines"
+        )
     
     def _calculate_demo_health_score(self, nutrition_facts: Dict[str, Any]) -> int:
         """Calculate health score based on nutrition facts"""
-        score = 100
-        
-        # Deduct points for high values
-        sodium = nutrition_facts.get('sodium', 0)
-        if sodium > 600:
-            score -= min(30, (sodium - 600) // 10)
-        
-        sugar = nutrition_facts.get('total_sugars', 0)
-        if sugar > 12:
-            score -= min(25, (sugar - 12) * 2)
-        
-        sat_fat = nutrition_facts.get('saturated_fat', 0)
-        if sat_fat > 5:
-            score -= min(20, (sat_fat - 5) * 3)
-        
-        return max(0, score)
+        return self._evaluate(nutrition_facts)[0]
 
 # Create global instance
 simple_medical_llm_service = SimpleMedicalLLMService()